@@ -0,0 +1,240 @@
+import os
+import io
+import gc
+import sys
+import json
+import time
+import random
+import argparse
+import platform
+import tempfile
+import tracemalloc
+import contextlib
+import numpy as np
+import signed_utils as utils
+from module import *
+
+
+"""
+性能基准测试：在植入划分的合成符号网络上运行各个组件与算法，记录运行时间、内存峰值与最终的frustration。
+
+    python benchmark.py --sizes 1000 10000 --output bench.json
+    python benchmark.py --sizes 1000 10000 --output new.json --compare bench.json
+
+结果写入JSON文件，给定--compare时与之前的结果逐项比较，运行时间变慢超过--threshold的项会被标出。
+给定--profile时每一项另外记录热点路径的计数器与各阶段的计时（见module.profiling）。
+"""
+
+
+BENCHMARKS = ['load_data', 'load_data_fast', 'neighborhood', 'frustration', 'local_move', 'community_merge',
+              'lpa', 'seed_expansion', 'iterated_greedy', 'variable_neighborhood_search', 'relocation_heuristic']
+
+
+def measure(func, trace_memory=True):
+    """
+    运行func并记录运行时间与内存峰值，func运行过程中的输出会被屏蔽
+
+    :param func: 无参数的函数，返回frustration或None
+    :param trace_memory: 是否使用tracemalloc记录内存峰值（会使运行时间变长）
+    :return: dict(time, peak_memory, frustration)，开启了profiling时另有profile一项
+    """
+
+    profiling.stats.reset()
+    gc.collect()
+    if trace_memory:
+        tracemalloc.start()
+    start = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        value = func()
+    elapsed = time.perf_counter() - start
+    peak = None
+    if trace_memory:
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+
+    result = {
+        'time': elapsed,
+        'peak_memory': peak,
+        'frustration': None if value is None else int(value)
+    }
+    if profiling.enabled():
+        result['profile'] = profiling.stats.as_dict()
+
+    return result
+
+
+def run_suite(vnum, args):
+    """
+    在一个规模为vnum的合成网络上运行所有选中的基准测试
+
+    :return: list(dict)，每一项为一个基准测试的结果
+    """
+
+    import label_propagation_algorithm as lpa
+    import seed_expansion as sea
+    import iterated_greedy_algorithm as iga
+    import variable_neighborhood_search as vns
+    import relocation_heuristic as rh
+
+    dataset, __ = utils.generate_planted_partition(vnum, args.k, avg_degree=args.degree, noise=args.noise,
+                                                   seed=args.seed, compact=args.compact)
+    neighborhood = Neighborhood(dataset).neighborhood_structure
+    workdir = tempfile.mkdtemp()
+    path = os.path.join(workdir, 'planted-%d.g' % vnum)
+    with contextlib.redirect_stdout(io.StringIO()):
+        utils.dataset2g(dataset, path)
+
+    def seeded(func):
+        def wrapper():
+            random.seed(args.seed)
+            return func()
+        return wrapper
+
+    def load_data():
+        utils.load_data(path)
+
+    def load_data_fast():
+        utils.load_data_fast(path, compact=args.compact, cache=False)
+
+    def local_move():
+        obj = Frustration(dataset)
+        obj.update_objective_function()
+        LocalSearch(obj, neighborhood).local_move()
+        return obj.obj_value
+
+    def community_merge():
+        obj = Frustration(dataset, init_solution=lpa_solution)
+        obj.update_objective_function()
+        LocalSearch(obj, neighborhood).community_merge()
+        return obj.obj_value
+
+    def seed_expansion():
+        obj = Frustration(dataset)
+        sea.SeedExpansion(dataset, neighborhood).seed_expansion(obj)
+        return obj.update_objective_function()
+
+    def iterated_greedy():
+        ig = iga.IteratedGreedy(dataset)
+        ig.run(max_iter=args.iterations)
+        return ig.best_value
+
+    def variable_neighborhood_search():
+        # 与variable_neighborhood_search.py中的用法一致，从Relocation Heuristic得到的k个社区出发
+        return vns.VariableNeighborhoodSearch(dataset, rh_solution).run(args.iterations, is_print=False)
+
+    def relocation_heuristic():
+        return rh.RelocationHeuristic(dataset, args.k).run(args.starts, is_print=False)
+
+    random.seed(args.seed)
+    lpa_solution = lpa.LabelPropagation(dataset, neighborhood).label_propagation()[0]
+    rh_solution = rh.RelocationHeuristic(dataset, args.k).relocation_heuristic()[0]
+
+    suite = {
+        'load_data': load_data,
+        'load_data_fast': load_data_fast,
+        'neighborhood': lambda: Neighborhood(dataset).neighborhood_structure and None,
+        'frustration': lambda: Frustration(dataset, init_solution=lpa_solution).objective_function(),
+        'local_move': local_move,
+        'community_merge': community_merge,
+        'lpa': lambda: Frustration(dataset, lpa.LabelPropagation(dataset, neighborhood).label_propagation()[0])
+        .objective_function(),
+        'seed_expansion': seed_expansion,
+        'iterated_greedy': iterated_greedy,
+        'variable_neighborhood_search': variable_neighborhood_search,
+        'relocation_heuristic': relocation_heuristic,
+    }
+
+    results = []
+    for name in args.benchmarks:
+        for repeat in range(args.repeat):
+            result = measure(seeded(suite[name]), trace_memory=not args.no_memory)
+            result.update({'benchmark': name, 'vnum': dataset.vnum, 'enum': dataset.enum, 'repeat': repeat})
+            results.append(result)
+            print('%-30s n=%-8d %10.4fs  %s' % (name, dataset.vnum, result['time'],
+                                                '' if result['frustration'] is None else result['frustration']))
+
+    os.remove(path)
+    os.rmdir(workdir)
+
+    return results
+
+
+def compare(results, baseline, threshold):
+    """
+    与之前的结果比较，按(benchmark, vnum)取最短运行时间
+
+    :return: 变慢超过threshold的项的数目
+    """
+
+    def best(records):
+        table = {}
+        for r in records:
+            key = (r['benchmark'], r['vnum'])
+            table[key] = min(table.get(key, float('inf')), r['time'])
+        return table
+
+    current, previous = best(results), best(baseline['results'])
+    regressions = 0
+    print('=' * 60)
+    for key in sorted(current):
+        if key not in previous:
+            continue
+        ratio = current[key] / previous[key] if previous[key] > 0 else float('inf')
+        flag = ''
+        if ratio > 1 + threshold:
+            flag = '  <-- regression'
+            regressions += 1
+        print('%-30s n=%-8d %8.2fx%s' % (key[0], key[1], ratio, flag))
+
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Benchmark structural balance algorithms on synthetic signed graphs.')
+    parser.add_argument('--sizes', type=int, nargs='+', default=[1000, 10000], help='number of nodes')
+    parser.add_argument('--k', type=int, default=8, help='number of planted communities')
+    parser.add_argument('--degree', type=float, default=10, help='average degree')
+    parser.add_argument('--noise', type=float, default=0.05, help='probability of flipping an edge sign')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--compact', action='store_true', help='use the compact SignedGraph representation')
+    parser.add_argument('--iterations', type=int, default=5, help='iterations of IG and VNS')
+    parser.add_argument('--starts', type=int, default=3, help='starts of the relocation heuristic')
+    parser.add_argument('--repeat', type=int, default=1)
+    parser.add_argument('--benchmarks', nargs='+', default=BENCHMARKS, choices=BENCHMARKS)
+    parser.add_argument('--no-memory', action='store_true', help='do not trace peak memory (faster, less overhead)')
+    parser.add_argument('--profile', action='store_true', help='record hot-path counters and phase timers')
+    parser.add_argument('--output', default='benchmark.json')
+    parser.add_argument('--compare', help='a previous output file to compare with')
+    parser.add_argument('--threshold', type=float, default=0.2, help='relative slowdown reported as regression')
+    args = parser.parse_args(argv)
+    if args.profile:
+        profiling.enable()
+
+    results = []
+    for vnum in args.sizes:
+        results.extend(run_suite(vnum, args))
+
+    report = {
+        'meta': {
+            'python': platform.python_version(),
+            'numpy': np.__version__,
+            'platform': platform.platform(),
+            'time': time.strftime('%Y-%m-%d %H:%M:%S'),
+            'args': vars(args),
+        },
+        'results': results,
+    }
+    with open(args.output, 'w') as f:
+        json.dump(report, f, indent=2)
+    print('-> 结果已写入：' + args.output)
+
+    if args.compare:
+        with open(args.compare) as f:
+            regressions = compare(results, json.load(f), args.threshold)
+        return 1 if regressions else 0
+
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -21,16 +21,31 @@ import random as rd
 
 class IteratedGreedy:
 
-    def __init__(self, dataset):
+    def __init__(self, dataset, warm_start=None, init_method='lpa'):
+        """
+        :param dataset: 数据集
+        :param warm_start: 可选，由utils.save_solution保存的解（文件名）或解本身，给出时代替init_method作为初始解
+        :param init_method: 初始解的生成方式，lpa或grasp
+        """
         self._dataset = dataset
+        self.warm_start = warm_start
+        self.init_method = init_method
         self.objective_function = Frustration(dataset)
         self.neighborhood = Neighborhood(dataset).neighborhood_structure
         self.best_solution_set = []
+        self.best_solution = None
         self.best_value = 2 << 31
 
     def initialization(self):
-        init = Initialization(self._dataset)
-        solution, partition = init.lpa_initialization(neighborhood=self.neighborhood)
+        init = Initialization(self._dataset, self.neighborhood)
+        if self.warm_start is not None:
+            solution, partition = init.warm_start_initialization(self.warm_start)
+        elif self.init_method == 'grasp':
+            solution, partition = init.grasp_initialization(seed=rd.getrandbits(32))
+        elif self.init_method == 'lpa':
+            solution, partition = init.lpa_initialization()
+        else:
+            raise ValueError('unknown init_method: ' + str(self.init_method))
         self.objective_function.set_solution(solution)
         self.objective_function.update_objective_function()
 
@@ -42,33 +57,64 @@ class IteratedGreedy:
         destruction_nodes = self.__destruction(beta)
         self.__reconstruction(destruction_nodes, p_type='all')
 
-    def run(self, max_iter=200):
-        self.initialization()
-        ct = 0
+    def run(self, max_iter=200, time_budget=None, max_no_improvement=None, callback=None, is_print=False):
+        """
+        算法的运行函数，满足任意一个停止条件即停止，停止时best_solution与best_value总是当前的最优解
+
+        :param max_iter: 最大迭代次数
+        :param time_budget: 墙钟时间限制（秒）
+        :param max_no_improvement: 连续没有改进的迭代次数限制
+        :param callback: callback(elapsed, iteration, value, best)，每次迭代之后调用，返回True时停止
+        :param is_print: 是否输出运行过程中的信息
+        :return: 最优的目标函数值
+        """
+
+        if is_print and callback is None:
+            callback = print_progress
+        termination = Termination(max_iter, time_budget, max_no_improvement, callback)
+
+        with profiling.phase('ig.initialization'):
+            self.initialization()
         ls = self.local_search()
+        obj = self.objective_function
+
+        ls.local_move()
+        # ls.community_merge()
+        obj.checkpoint()
+        self.best_value = obj.obj_value
 
-        while ct < max_iter:
+        while not termination.stop():
             # print(self.objective_function.solution)
             # print(self.objective_function.partition)
 
-            ls.local_move()
+            with profiling.phase('ig.reconstruction'):
+                self.destruction_and_reconstruction(0.3)
+            with profiling.phase('ig.local_search'):
+                ls.local_move()
             # ls.community_merge()
+            value = obj.obj_value
 
-            if self.objective_function.obj_value < self.best_value:
-                self.best_value = self.objective_function.obj_value
-                self.best_solution_set = [self.objective_function.solution, self.objective_function.partition]
+            # 接受准则：不差于当前最优解时接受，否则撤销至上一个checkpoint
+            with profiling.phase('ig.acceptance'):
+                if obj.obj_value <= self.best_value:
+                    obj.checkpoint()
+                    self.best_value = obj.obj_value
+                else:
+                    obj.rollback()
 
-            print('%d/%d: best value --> %d' % (ct, max_iter, self.best_value))
+            termination.update(value, self.best_value)
 
-            self.destruction_and_reconstruction(0.3)
-            ls.local_move()
-            # ls.community_merge()
-            ct += 1
+        self.best_solution = obj.solution.copy()
+        self.best_solution_set = [self.best_solution, obj.partition.copy()]
 
-        print('IG Complete!')
-        print('=' * 40)
-        print('Best Value:', self.best_value)
-        print('Number of Community:', len(self.best_solution_set[1]))
+        if is_print:
+            print('IG Complete!')
+            print('=' * 40)
+            print('Running time:', termination.elapsed)
+            print('Best Value:', self.best_value)
+            print('Number of Community:', len(self.best_solution_set[1]))
+
+        return self.best_value
 
     def __destruction(self, beta):
 
@@ -77,28 +123,36 @@ class IteratedGreedy:
         return candidate_node
 
     def __reconstruction(self, destruction_nodes, p_type):
+        """
+        将被破坏的结点逐个移动至随机选择的社区，通过delta_caused_by_move增量维护目标函数值
+
+        :param destruction_nodes: 被破坏的结点
+        :param p_type: all为在所有社区中选择，neighbor为在邻接社区中选择
+        :return: None
+        """
 
         obj = self.objective_function
 
         if p_type == 'all':
             # 将结点往所有的社区进行移动
-            candidate_community = set(obj.partition.keys())
+            candidate_community = list(obj.partition.keys())
+            if len(candidate_community) < 2:
+                return
             for node in destruction_nodes:
-                try:
-                    obj.solution[node] = rd.choice(list(candidate_community - {obj.solution[node]}))
-                except IndexError:
-                    continue
+                current = obj.solution[node]
+                destination = current
+                while destination == current:
+                    destination = rd.choice(candidate_community)
+                obj.move(node, destination, obj.delta_caused_by_move(node, destination, self.neighborhood[node]))
 
         elif p_type == 'neighbor':
             # 将结点往邻居社区进行移动
             for node in destruction_nodes:
                 try:
-                    obj.solution[node] = rd.choice(list(obj.get_adjacent_community(node, self.neighborhood)))
+                    destination = rd.choice(list(obj.get_adjacent_community(node, self.neighborhood)))
                 except IndexError:
                     continue
-
-        obj.partition = utils.solution2partition(obj.solution)
-        obj.update_objective_function()
+                obj.move(node, destination, obj.delta_caused_by_move(node, destination, self.neighborhood[node]))
 
 
 if __name__ == '__main__':
@@ -110,6 +164,6 @@ if __name__ == '__main__':
 
     ig = IteratedGreedy(ds)
     t1 = time.time()
-    ig.run()
+    ig.run(is_print=True)
     t2 = time.time()
     print('Total time cost:', t2 - t1)
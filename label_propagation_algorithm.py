@@ -1,6 +1,9 @@
 import signed_utils as utils
 import random as rd
 import collections
+import numpy as np
+from multiprocessing import shared_memory
+from module.partition import Partition
 
 
 class LabelPropagation:
@@ -15,15 +18,42 @@ class LabelPropagation:
         self._dataset = dataset
         self.neighborhood = neighborhood
 
-    def label_propagation(self, max_iter=5, print_info=False):
+    def label_propagation(self, max_iter=5, print_info=False, mode='async', n_workers=None):
         """
         基于标签传播的初始解生成方式。
 
+        mode给出标签更新的方式：
+        * async，异步更新，按随机顺序逐个结点更新；
+        * sync，同步更新，所有结点由上一轮的标签一次性向量化地更新，可能出现标签振荡；
+        * semi-sync，半同步更新，先对网络着色，同一颜色的结点互不相邻，按颜色逐批向量化地同步更新，不会振荡。
+
         :param print_info: 输出信息开关
         :param max_iter: 最大迭代次数
-        :return: solution: dict, partition: dict(community: set())
+        :param mode: async、sync或semi-sync
+        :param n_workers: sync与semi-sync模式下，每一批结点分给n_workers个进程计算，默认不使用进程池
+        :return: solution: np.ndarray, partition: Partition
         """
 
+        if mode == 'async':
+            solution = self.__asynchronous(max_iter)
+        elif mode in ('sync', 'semi-sync'):
+            solution = self.__synchronous(max_iter, mode == 'semi-sync', n_workers)
+        else:
+            raise ValueError('unknown mode: ' + str(mode))
+
+        # reform the solution and partition: community ids start from 0
+        partition = Partition.from_solution(solution, self._dataset.vnum).relabel()
+        solution = partition.labels
+
+        if print_info:
+            print('Solution:', solution)
+            print('Partition:', partition)
+            print('Number of clusters:', len(partition))
+
+        return solution, partition
+
+    def __asynchronous(self, max_iter):
+
         solution, __ = utils.standard_initialize(self._dataset.vnum)
         changed = True
         ct = 0
@@ -42,22 +72,60 @@ class LabelPropagation:
                     changed = True
                 solution[node] = mcc
 
-        # reform the solution and partition
-        partition = utils.solution2partition(solution)
-        partition = utils.reform_partition(partition)
-        solution = utils.partition2solution(partition, self._dataset.vnum)
+        return solution
 
-        if print_info:
-            print('Solution:', solution)
-            print('Partition:', partition)
-            print('Number of clusters:', len(partition))
+    def __synchronous(self, max_iter, semi, n_workers):
+        """
+        在紧凑形式的网络上向量化地进行标签传播：对一批结点的所有邻接表项，以 结点 * vnum + 邻居标签 为键，
+        用np.unique与np.bincount将正负边累加为每个(结点, 标签)的得分，再对每个结点取得分最大的标签
 
-        return solution, partition
+        :return: np.ndarray
+        """
+
+        graph = utils.SignedGraph.from_neighborhood(self.neighborhood)
+        vnum = graph.vnum
+
+        if semi:
+            batches = _jones_plassmann_coloring(graph, np.random.RandomState(rd.randrange(1 << 32)))
+        else:
+            batches = [np.arange(vnum)]
+
+        # 每一批结点的邻接表项及其划分只需确定一次
+        parallel = n_workers is not None and n_workers > 1
+        chunks = [_split_rows(graph.indptr, rows, graph.row_entries(rows), n_workers if parallel else 1)
+                  for rows in batches]
+        src, sign = graph.sources(), graph.sign.astype(np.float64)
+
+        if not parallel:
+            labels = np.arange(vnum, dtype=np.int64)
+            return _propagate(labels, chunks, max_iter, lambda batch: [
+                _most_common_labels(*_chunk_args(graph, src, sign, labels, rows, entries))
+                for rows, entries in chunks[batch]])
+
+        # 标签放在共享内存中，进程池启动时一次性传入网络与各批的划分，之后每个任务只传递(批, 块)的编号
+        memory = shared_memory.SharedMemory(create=True, size=max(1, vnum) * np.dtype(np.int64).itemsize)
+        try:
+            shared = np.ndarray(vnum, dtype=np.int64, buffer=memory.buf)
+            shared[:] = np.arange(vnum)
+            with utils.process_pool(n_workers, initializer=_init_lpa_worker,
+                                    initargs=(graph, src, sign, chunks, memory.name)) as pool:
+                def compute(batch):
+                    tasks = [pool.submit(_lpa_worker, batch, chunk) for chunk in range(len(chunks[batch]))]
+                    return [task.result() for task in tasks]
+                labels = _propagate(shared, chunks, max_iter, compute).copy()
+        finally:
+            # 释放对共享内存的引用之后才能关闭
+            shared = None
+            memory.close()
+            memory.unlink()
+
+        return labels
 
     @staticmethod
     def __most_common_community_label(node, current_solution, node_neighborhood):
         """
-        找到最公共的社区标签
+        找到最公共的社区标签。得分相同的标签之间随机选择，结果与邻居的存储顺序无关
+        （紧凑形式的邻居按编号排好序，按先后取会总是偏向编号小的邻居的标签）
 
         :param node: 节点序号
         :return: 正邻居为其社区+1，负邻居为其社区-1.由此得到的最大值
@@ -72,6 +140,141 @@ class LabelPropagation:
             label_num[current_solution[elem]] -= 1
 
         if label_num:
-            return max(label_num, key=label_num.get)
+            max_num = max(label_num.values())
+            return rd.choice([label for label, num in label_num.items() if num == max_num])
         else:
-            return current_solution[node]
\ No newline at end of file
+            return current_solution[node]
+
+
+# 子进程中同步标签传播所需的网络、各批结点的划分与共享的标签，由进程池的initializer设置
+_lpa_context = None
+
+
+def _init_lpa_worker(graph, src, sign, chunks, memory_name):
+    global _lpa_context
+    memory = shared_memory.SharedMemory(name=memory_name)
+    labels = np.ndarray(graph.vnum, dtype=np.int64, buffer=memory.buf)
+    _lpa_context = (graph, src, sign, chunks, labels, memory)
+
+
+def _lpa_worker(batch, chunk):
+    graph, src, sign, chunks, labels, __ = _lpa_context
+    return _most_common_labels(*_chunk_args(graph, src, sign, labels, *chunks[batch][chunk]))
+
+
+def _chunk_args(graph, src, sign, labels, rows, entries):
+    return rows, labels[rows], src[entries], labels[graph.indices[entries]], sign[entries], graph.vnum
+
+
+def _propagate(labels, chunks, max_iter, compute):
+    """
+    按批同步更新标签，直到没有标签变化或达到最大迭代次数
+
+    :param labels: 标签，原地更新
+    :param chunks: 每一批结点划分成的块，见_split_rows
+    :param max_iter: 最大迭代次数
+    :param compute: compute(批)，由更新前的标签计算这一批的每一块，返回list((结点, 新标签))
+    :return: labels
+    """
+
+    changed = True
+    ct = 0
+    while changed and ct < max_iter:
+        ct += 1
+        changed = False
+
+        for batch in range(len(chunks)):
+            # 同一批的所有块都算完之后再写回
+            for nodes, best in compute(batch):
+                if not changed and np.any(labels[nodes] != best):
+                    changed = True
+                labels[nodes] = best
+
+    return labels
+
+
+def _most_common_labels(rows, current, src, nbr_label, sign, vnum):
+    """
+    向量化地为一批结点找到最公共的社区标签，规则与LabelPropagation.__most_common_community_label相同，
+    得分相同时优先保留结点当前的标签，其次取编号最小的标签
+
+    :param rows: 这一批结点，升序
+    :param current: 这一批结点当前的标签
+    :param src: 邻接表项的起点
+    :param nbr_label: 邻接表项终点的标签
+    :param sign: 邻接表项的符号
+    :param vnum: 结点个数
+    :return: (结点, 新标签)，没有邻居的结点不在其中
+    """
+
+    if src.size == 0:
+        return rows[:0], current[:0]
+
+    key = src.astype(np.int64) * vnum + nbr_label
+    unique_key, inverse = np.unique(key, return_inverse=True)
+    score = np.bincount(inverse.reshape(-1), weights=sign, minlength=unique_key.size)
+    node, label = unique_key // vnum, unique_key % vnum
+
+    # unique_key有序，同一结点的各个标签是连续的一段
+    starts = np.flatnonzero(np.r_[True, node[1:] != node[:-1]])
+    segment = np.repeat(np.arange(starts.size), np.diff(np.r_[starts, node.size]))
+    candidate = score == np.maximum.reduceat(score, starts)[segment]
+    own = label == current[np.searchsorted(rows, node)]
+    priority = candidate.astype(np.int8) + (candidate & own)
+
+    pick = np.lexsort((-priority, segment))[starts]
+    return node[pick], label[pick]
+
+
+def _split_rows(indptr, rows, entries, parts):
+    """
+    将一批结点按邻接表项的数目大致均分为parts份
+
+    :return: list((结点, 邻接表项))
+    """
+
+    if parts <= 1:
+        return [(rows, entries)]
+
+    ends = np.cumsum(indptr[rows + 1] - indptr[rows])
+    cuts = np.searchsorted(ends, np.linspace(0, entries.size, parts + 1)[1:-1])
+    row_bounds = [0] + (cuts + 1).tolist() + [rows.size]
+    chunks = []
+    for a, b in zip(row_bounds[:-1], row_bounds[1:]):
+        if a < b:
+            start = ends[a - 1] if a > 0 else 0
+            chunks.append((rows[a:b], entries[start:ends[b - 1]]))
+    return chunks
+
+
+def _jones_plassmann_coloring(graph, random_state):
+    """
+    Jones-Plassmann着色：每一轮中，随机优先级比所有未着色邻居都高的结点着同一种颜色，
+    同一颜色的结点两两不相邻
+
+    :param graph: utils.SignedGraph
+    :param random_state: np.random.RandomState
+    :return: list(np.ndarray)，每种颜色的结点，升序
+    """
+
+    priority = random_state.permutation(graph.vnum)
+    uncolored = np.ones(graph.vnum, dtype=bool)
+    src, dst = graph.sources(), graph.indices
+    keep = src != dst
+    src, dst = src[keep], dst[keep]
+
+    batches = []
+    while uncolored.any():
+        keep = uncolored[src] & uncolored[dst]
+        src, dst = src[keep], dst[keep]
+
+        nbr_max = np.full(graph.vnum, -1, dtype=priority.dtype)
+        if src.size:
+            starts = np.flatnonzero(np.r_[True, src[1:] != src[:-1]])
+            nbr_max[src[starts]] = np.maximum.reduceat(priority[dst], starts)
+
+        selected = uncolored & (priority > nbr_max)
+        batches.append(np.flatnonzero(selected))
+        uncolored[selected] = False
+
+    return batches
\ No newline at end of file
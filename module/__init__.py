@@ -1,18 +1,31 @@
-from .frustration import Frustration
-from .local_search import LocalSearch
-from .neighborhood import Neighborhood
+from .frustration import Frustration, WeightedFrustration
+from .local_search import LocalSearch, ActiveSet
+from .neighborhood import Neighborhood, WeightedNeighborhood
 from .initialization import Initialization
+from .partition import Partition
 from .objective_function import ObjectiveFunction
+from .dynamic import DynamicNetwork
+from .termination import Termination, print_progress
+from . import profiling
 
 
 """
 The data structure of this program is agreed here.
 1. The solution of the problem is described by a list or a dict, sometimes a numpy.ndarray.
-    * I think a list is the best.
+    * Inside ObjectiveFunction it is always the int32 numpy.ndarray held by a Partition.
+    * Every Initialization method returns (solution, partition) as (numpy.ndarray, Partition).
     example: self.solution = {i: i for i in range(n)}
              self.solution = [0] * n
 2. The partition is described by a dict with numbers as keys and sets as values.
     example: self.partition = {0: {0, 1, 2}, 1: {3, 4, 5}, 2: {6}}
+    * module.Partition is such a dict which also holds the solution as labels,
+      both are kept in sync by Partition.move/merge/relabel.
+    * After ObjectiveFunction.checkpoint(), every move/merge is journaled; rollback() and best()
+      cost time proportional to the changes since the last checkpoint.
 3. The dataset is represented by a two-dimensional default dict.
     example: defaultdict(lambda: defaultdict(lambda: 0))
+    * For large networks, use the compact utils.SignedGraph instead (see utils.dataset2compact).
+      It can be used as the neighborhood structure as well: graph[node] = {'+': array, '-': array}
 """
+
+profiling._enable_from_environment()
@@ -0,0 +1,145 @@
+import collections
+import signed_utils as utils
+from module.frustration import Frustration
+from module.local_search import LocalSearch
+
+
+class DynamicNetwork:
+    """
+    在线更新的符号网络：边可以随时加入、删除或改变符号。
+    每条边的更新在O(1)时间内同步维护数据集、邻域结构与目标函数值（包括社区连边统计表），
+    受影响的结点被记录下来，之后由repair只对它们进行局部的结点移动，不需要重新运行整个算法。
+
+    数据集必须为dict(dict())形式，紧凑的SignedGraph是只读的，可以先用SignedGraph.to_dict转换。
+
+        network = DynamicNetwork(obj_function, neighborhood)
+        network.add_edge(0, 5, -1)
+        network.flip_edge(3, 4)
+        network.repair()
+    """
+
+    def __init__(self, obj_function: Frustration, neighborhood):
+        """
+        :param obj_function: 目标函数，其数据集即为要更新的网络
+        :param neighborhood: 由Neighborhood生成的邻域结构
+        """
+
+        self._dataset = obj_function._dataset
+        if isinstance(self._dataset.data, utils.SignedGraph) or isinstance(neighborhood, utils.SignedGraph):
+            raise TypeError('SignedGraph is read-only, convert it with SignedGraph.to_dict first')
+
+        self.objective_function = obj_function
+        self.neighborhood = neighborhood
+        self.local_search = LocalSearch(obj_function, neighborhood)
+        # 自上一次repair以来端点发生变化的结点
+        self.touched = set()
+
+    def sign(self, u, v):
+        """
+        :return: 边(u, v)的符号，不存在时为0
+        """
+
+        row = self._dataset.data.get(u)
+        return 0 if row is None else row.get(v, 0)
+
+    def add_edge(self, u, v, sign):
+        """
+        加入边(u, v)，已存在时改为给定的符号。结点编号超出vnum时自动增加结点，新结点单独成社区
+
+        :param u: 端点
+        :param v: 另一个端点
+        :param sign: 1或-1
+        :return: 目标函数值的变化
+        """
+
+        if u == v:
+            raise ValueError('self-loops are not supported: %d' % u)
+        if sign != 1 and sign != -1:
+            raise ValueError('sign must be 1 or -1, got %r' % (sign, ))
+
+        current = self.sign(u, v)
+        if current == sign:
+            return 0
+
+        delta = self.__remove(u, v, current) if current else 0
+        self.__grow(max(u, v) + 1)
+
+        data = self._dataset.data
+        for a, b in ((u, v), (v, u)):
+            if a not in data:
+                data[a] = collections.defaultdict(lambda: 0)
+            data[a][b] = sign
+            self.neighborhood[a]['+' if sign > 0 else '-'].add(b)
+
+        self._dataset.enum += 1
+        self._dataset.edge_cache = None
+        self.touched.update((u, v))
+
+        return delta + self.objective_function.change_edge(u, v, sign, 1)
+
+    def remove_edge(self, u, v):
+        """
+        删除边(u, v)，不存在时什么也不做
+
+        :return: 目标函数值的变化
+        """
+
+        current = self.sign(u, v)
+        return self.__remove(u, v, current) if current else 0
+
+    def flip_edge(self, u, v):
+        """
+        将边(u, v)的符号取反
+
+        :return: 目标函数值的变化
+        """
+
+        current = self.sign(u, v)
+        if not current:
+            raise KeyError('edge (%d, %d) does not exist' % (u, v))
+        return self.add_edge(u, v, -current)
+
+    def update(self, edges):
+        """
+        批量更新
+
+        :param edges: 可迭代的(u, v, sign)，sign为0时删除该边
+        :return: 目标函数值的总变化
+        """
+
+        delta = 0
+        for u, v, sign in edges:
+            delta += self.add_edge(u, v, sign) if sign else self.remove_edge(u, v)
+        return delta
+
+    def repair(self):
+        """
+        从受影响的结点出发进行局部的结点移动，只有邻居发生了移动的结点才会被继续考察
+
+        :return: 是否有结点发生了移动
+        """
+
+        nodes = sorted(self.touched)
+        self.touched.clear()
+        return self.local_search.local_move(nodes=nodes)
+
+    def __remove(self, u, v, sign):
+        data = self._dataset.data
+        key = '+' if sign > 0 else '-'
+        for a, b in ((u, v), (v, u)):
+            del data[a][b]
+            self.neighborhood[a][key].discard(b)
+
+        self._dataset.enum -= 1
+        self._dataset.edge_cache = None
+        self.touched.update((u, v))
+
+        return self.objective_function.change_edge(u, v, sign, -1)
+
+    def __grow(self, vnum):
+        if vnum <= self._dataset.vnum:
+            return
+        for node in range(self._dataset.vnum, vnum):
+            self.neighborhood[node] = {'+': set(), '-': set()}
+        self._dataset.vnum = vnum
+        self.objective_function.partition.grow(vnum)
@@ -1,34 +1,176 @@
 
+import collections
+import itertools
+import numpy as np
 import signed_utils as utils
 from module.objective_function import ObjectiveFunction
+from module.partition import Partition
 
 
 class Frustration(ObjectiveFunction):
 
-    def objective_function(self):
+    # 社区之间的连边统计表，{c1: {c2: [正边数, 负边数]}}（带权网络中为边权之和），
+    # 由build_community_links开启，之后随move与merge增量维护
+    community_links = None
+    _link_neighborhood = None
+
+    def set_solution(self, solution):
+        super().set_solution(solution)
+        if self.community_links is not None:
+            self.build_community_links(self._link_neighborhood)
+
+    def rollback(self):
         """
-        使用solution和dataset计算网络的line index of structural balance，时间复杂度O(m)
+        撤销上一个checkpoint之后的改动。开启了社区连边统计表时，撤销move的同时逆向更新统计表；
+        撤销了merge时统计表无法逐项拆分，撤销结束后重新统计
 
-        :return: 当前划分下的不平衡指数
+        :return: None
+        """
+
+        if self.community_links is None:
+            return super().rollback()
+
+        journal = self.partition.journal
+        rebuild = False
+        while journal:
+            entry = journal[-1]
+            if entry[0] == Partition.MERGE:
+                rebuild = True
+            elif not rebuild:
+                self.__move_links(entry[1], self.solution[entry[1]], entry[2])
+            self.partition.undo()
+
+        self.obj_value = self.checkpoint_value
+        if rebuild:
+            self.build_community_links(self._link_neighborhood)
+
+    def build_community_links(self, neighborhood):
+        """
+        统计当前划分下社区之间的正负边数目，c1与c2之间的统计量在两个方向上共享同一个list
+
+        :param neighborhood: 邻域结构，之后move时用于增量维护
+        :return: None
         """
 
-        data = self._dataset.data
         sl = self.solution
-        frustration = 0
+        self.community_links = collections.defaultdict(dict)
+        self._link_neighborhood = neighborhood
 
-        # 由于这里要频繁访问当前solution，所以最好使用dict来存储解(list查找效率很低)
-        for node in data:
+        for node in range(len(neighborhood)):
             cid = sl[node]
-            for nbr, attr in data[node].items():
-                # cluster内的负边
-                if sl[nbr] == cid and attr == -1:
-                    frustration += 1
-                # cluster间的正边
-                elif sl[nbr] != cid and attr == 1:
-                    frustration += 1
-
-        assert frustration % 2 == 0
-        return frustration // 2
+            for idx, key in enumerate(('+', '-')):
+                for v, w in self._link_weights(neighborhood[node][key]):
+                    # 每条边会从两个端点各访问一次，只在编号小的一端计数
+                    if node < v and sl[v] != cid:
+                        self.__add_link(cid, sl[v], idx, w)
+
+    @staticmethod
+    def _link_weights(neighbors):
+        """
+        :param neighbors: 结点的正邻居或负邻居
+        :return: 可迭代的(邻居, 边权)，无权网络中边权均为1
+        """
+        return zip(neighbors, itertools.repeat(1))
+
+    def __add_link(self, c1, c2, idx, value):
+        links = self.community_links
+        entry = links[c1].get(c2)
+        if entry is None:
+            entry = links[c1][c2] = links[c2][c1] = [0, 0]
+        entry[idx] += value
+        if entry[0] == 0 and entry[1] == 0:
+            del links[c1][c2], links[c2][c1]
+
+    def __move_links(self, node, source, destination):
+        sl = self.solution
+        node_neighborhood = self._link_neighborhood[node]
+        for idx, key in enumerate(('+', '-')):
+            for v, w in self._link_weights(node_neighborhood[key]):
+                cid = sl[v]
+                if v == node:
+                    continue
+                if cid != source:
+                    self.__add_link(source, cid, idx, -w)
+                if cid != destination:
+                    self.__add_link(destination, cid, idx, w)
+
+    def __merge_links(self, c1, c2):
+        links = self.community_links
+        row1, row2 = links[c1], links.pop(c2, {})
+        row1.pop(c2, None)
+        for cid, entry in row2.items():
+            if cid == c1:
+                continue
+            del links[cid][c2]
+            existing = row1.get(cid)
+            if existing is None:
+                row1[cid] = links[cid][c1] = entry
+            else:
+                existing[0] += entry[0]
+                existing[1] += entry[1]
+
+    def change_edge(self, u, v, sign, value):
+        """
+        边(u, v)加入或删除时增量更新目标函数值与社区连边统计表，O(1)。数据集与邻域结构由调用者维护
+
+        :param u: 端点
+        :param v: 另一个端点
+        :param sign: 边的符号，1或-1
+        :param value: 1为加入，-1为删除
+        :return: 目标函数值的变化
+        """
+
+        cu, cv = self.solution[u], self.solution[v]
+        # 正边在社区之间、负边在社区之内时不平衡
+        delta = value if (cu == cv) != (sign > 0) else 0
+        self.obj_value += delta
+
+        if self.community_links is not None and cu != cv:
+            self.__add_link(cu, cv, 0 if sign > 0 else 1, value)
+
+        return delta
+
+    def get_adjacent_community_of_community(self, cid, neighborhood):
+        if self.community_links is None:
+            return super().get_adjacent_community_of_community(cid, neighborhood)
+        return set(self.community_links[cid])
+
+    def objective_function(self):
+        """
+        使用solution和dataset计算网络的line index of structural balance，时间复杂度O(m)。
+        以向量化的方式进行：一条边不平衡，当且仅当“两端在同一cluster”与“边为正”不同时成立
+
+        :return: 当前划分下的不平衡指数
+        """
+
+        labels = utils.solution2array(self.solution, self._dataset.vnum)
+
+        return sum(int(np.count_nonzero((labels[u] == labels[v]) != positive))
+                   for u, v, positive in utils.edge_blocks(self._dataset))
+
+    def batch_objective_function(self, solutions, chunk_size=1 << 24):
+        """
+        同时计算多个候选解的不平衡指数
+
+        :param solutions: 二维数组，每一行是一个解；也可以是由多个解组成的list
+        :param chunk_size: 每次参与比较的 解的数目 * 边的数目 的上限，用于控制内存
+        :return: np.ndarray，每个解的不平衡指数
+        """
+
+        if isinstance(solutions, np.ndarray):
+            labels = solutions
+        else:
+            labels = np.array([utils.solution2array(sl, self._dataset.vnum) for sl in solutions])
+
+        frustration = np.zeros(labels.shape[0], dtype=np.int64)
+        step = max(1, chunk_size // max(1, labels.shape[0]))
+        for u, v, positive in utils.edge_blocks(self._dataset, block_size=step):
+            for start in range(0, u.size, step):
+                end = start + step
+                frustration += np.count_nonzero((labels[:, u[start:end]] == labels[:, v[start:end]])
+                                                != positive[start:end], axis=1)
+
+        return frustration
 
     def objective_function_v2(self, neighborhood, partition=None):
         """
@@ -51,8 +193,8 @@ class Frustration(ObjectiveFunction):
             for node in community:
 
                 node_nbr = neighborhood[node]
-                pos_out += len(node_nbr['+'] - community)  # 社区外正边
-                neg_in += len(community & node_nbr['-'])  # 社区内负边
+                pos_out += len(node_nbr['+']) - len(community.intersection(node_nbr['+']))  # 社区外正边
+                neg_in += len(community.intersection(node_nbr['-']))  # 社区内负边
 
             frustrations[cid] = pos_out + neg_in
 
@@ -97,6 +239,63 @@ class Frustration(ObjectiveFunction):
 
         return delta
 
+    def community_weight(self, node, node_neighborhood) -> dict:
+        """
+        遍历一次邻居，统计结点node与每个邻接社区之间的 正边数 - 负边数
+
+        :param node: 结点编号
+        :param node_neighborhood: 结点node的邻域
+        :return: dict(community: 正边数 - 负边数)
+        """
+
+        sl = self.solution
+        weight = collections.defaultdict(int)
+
+        pos_nbr, neg_nbr = node_neighborhood['+'], node_neighborhood['-']
+
+        if isinstance(pos_nbr, np.ndarray):
+            # 紧凑形式的邻居为数组，一次性取出所有邻居的社区编号
+            for cid in sl[pos_nbr].tolist():
+                weight[cid] += 1
+            for cid in sl[neg_nbr].tolist():
+                weight[cid] -= 1
+        else:
+            for v in pos_nbr:
+                weight[sl[v]] += 1
+            for v in neg_nbr:
+                weight[sl[v]] -= 1
+
+        return weight
+
+    def best_move(self, node, neighborhood, n_clusters=None):
+        """
+        由community_weight一次性得到所有邻接社区的delta：
+        从社区c移动至社区d引起的变化为 weight[c] - weight[d]，与delta_caused_by_move的结果相同
+
+        :param node: 结点编号
+        :param neighborhood: 邻域结构
+        :param n_clusters: 可选，社区编号的范围为range(n_clusters)时，另外考虑一个不与node相邻的社区，
+                           移动至任何不相邻的社区引起的变化都是weight[c]，只需考虑一个
+        :return: (目标社区, 引起的变化)，没有候选社区时目标社区为-1
+        """
+
+        weight = self.community_weight(node, neighborhood[node])
+        current = self.solution[node]
+        current_weight = weight.pop(current, 0)
+
+        candidate, max_weight = -1, 0
+        for cid, w in weight.items():
+            if candidate == -1 or w > max_weight:
+                max_weight = w
+                candidate = cid
+
+        if n_clusters is not None and (candidate == -1 or max_weight < 0):
+            other = _non_adjacent_cluster(weight, current, n_clusters)
+            if other != -1:
+                candidate, max_weight = other, 0
+
+        return candidate, current_weight - max_weight
+
     def move(self, node, destination, delta):
         """
         将成员变量solution与partition进行结点移动式的调整
@@ -109,11 +308,10 @@ class Frustration(ObjectiveFunction):
 
         pre_cid = self.solution[node]
 
-        self.solution[node] = destination
-        self.partition[pre_cid].remove(node)
-        if not self.partition[pre_cid]:
-            del self.partition[pre_cid]
-        self.partition[destination].add(node)
+        if self.community_links is not None:
+            self.__move_links(node, pre_cid, destination)
+
+        self.partition.move(node, destination)
 
         self.obj_value += delta
 
@@ -127,18 +325,18 @@ class Frustration(ObjectiveFunction):
         :return: merge前-merge后，结果为负则意味着划分更优
         """
 
+        if self.community_links is not None:
+            # 直接由社区间的连边统计表得到：正边变为社区内，负边也变为社区内
+            entry = self.community_links[c1].get(c2)
+            return 0 if entry is None else entry[1] - entry[0]
+
         c1_community, c2_community = self.partition[c1], self.partition[c2]
-        data = self._dataset.data
         delta = 0
 
         for node in c1_community:
-            intersection = (neighborhood[node]['+'] | neighborhood[node]['-']) & c2_community
-
-            for another_node in intersection:
-                if data[node][another_node] == 1:
-                    delta -= 1
-                elif data[node][another_node] == -1:
-                    delta += 1
+            # 两个社区间的正边变为社区内，imbalance减少；负边则相反
+            delta -= len(c2_community.intersection(neighborhood[node]['+']))
+            delta += len(c2_community.intersection(neighborhood[node]['-']))
 
         return delta
 
@@ -152,15 +350,118 @@ class Frustration(ObjectiveFunction):
         :return: 无
         """
 
-        for node in self.partition[c2]:
-            self.solution[node] = c1
+        if self.community_links is not None:
+            self.__merge_links(c1, c2)
 
-        self.partition[c1] = self.partition[c1] | self.partition[c2]
-        del self.partition[c2]
+        self.partition.merge(c1, c2)
 
         self.obj_value += delta
 
 
+def _non_adjacent_cluster(adjacent, current, n_clusters):
+    """
+    :return: range(n_clusters)中第一个既不是current、也不在adjacent中的社区，不存在时为-1。至多检查len(adjacent) + 2个编号
+    """
+
+    for cid in range(n_clusters):
+        if cid != current and cid not in adjacent:
+            return cid
+    return -1
+
+
+class WeightedFrustration(Frustration):
+    """
+    带权网络上的frustration，用于多层次局部搜索中聚合之后的网络：
+    数据集由utils.aggregate_network生成，data[u][v] = [正边权, 负边权]，邻域结构由WeightedNeighborhood生成。
+    超结点的自环表示社区内部的边，其中的负边权无论如何划分都计入frustration
+    """
+
+    def objective_function(self):
+        """
+        :return: 当前划分下的带权不平衡指数
+        """
+
+        sl = self.solution
+        frustration = 0
+
+        for node, row in self._dataset.data.items():
+            cid = sl[node]
+            for nbr, (pos, neg) in row.items():
+                if nbr == node:
+                    # 自环只访问一次
+                    frustration += 2 * neg
+                elif sl[nbr] == cid:
+                    frustration += neg
+                else:
+                    frustration += pos
+
+        return frustration // 2
+
+    def objective_function_v2(self, neighborhood, partition=None):
+        return self.objective_function()
+
+    def delta_caused_by_move(self, node, destination, node_neighborhood):
+        """
+        带权版本的delta_caused_by_move，自环不受移动的影响
+
+        :return: move前 - move后，值为负则意味着更优
+        """
+
+        current_cluster = self.solution[node]
+        if current_cluster == destination:
+            return 0
+
+        weight = self.community_weight(node, node_neighborhood)
+        return weight.get(current_cluster, 0) - weight.get(destination, 0)
+
+    def community_weight(self, node, node_neighborhood) -> dict:
+        """
+        :return: dict(community: 正边权 - 负边权)
+        """
+
+        sl = self.solution
+        weight = collections.defaultdict(int)
+
+        for v, w in node_neighborhood['+'].items():
+            if v != node:
+                weight[sl[v]] += w
+        for v, w in node_neighborhood['-'].items():
+            if v != node:
+                weight[sl[v]] -= w
+
+        return weight
+
+    def delta_caused_by_merge(self, c1, c2, neighborhood):
+        """
+        带权版本的delta_caused_by_merge，开启了社区连边统计表时直接由统计表得到
+
+        :return: merge前-merge后，结果为负则意味着划分更优
+        """
+
+        if self.community_links is not None:
+            return super().delta_caused_by_merge(c1, c2, neighborhood)
+
+        c2_community = self.partition[c2]
+        delta = 0
+
+        for node in self.partition[c1]:
+            delta -= sum(w for v, w in neighborhood[node]['+'].items() if v in c2_community)
+            delta += sum(w for v, w in neighborhood[node]['-'].items() if v in c2_community)
+
+        return delta
+
+    @staticmethod
+    def _link_weights(neighbors):
+        """
+        :param neighbors: {邻居: 边权}
+        :return: 可迭代的(邻居, 边权)，自环表示社区内部的边，不计入社区之间的连边统计
+        """
+        return neighbors.items()
+
+    def change_edge(self, u, v, sign, value):
+        raise NotImplementedError('aggregated networks are not updated incrementally')
+
+
 if __name__ == "__main__":
 
     file_path = r'C:\Users\WQQDuan\PycharmProjects\conda\social_network\src\Slashdot\slashdot-undirected-size200-part0.g'
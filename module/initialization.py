@@ -1,5 +1,70 @@
+import os
+import random as rd
+import numpy as np
+import scipy.sparse
+import scipy.sparse.linalg
+import scipy.cluster.vq
 import signed_utils as utils
 from module.local_search import LocalSearch
+from module.partition import Partition
+from module.frustration import Frustration
+
+
+# 子进程中GRASP所需的共享数据集（见utils.shared_dataset）与参数，由进程池的initializer设置
+_grasp_context = None
+
+
+def _init_grasp_worker(dataset, alpha):
+    global _grasp_context
+    # 紧凑形式的网络本身即为邻域结构
+    _grasp_context = (dataset, dataset.data, alpha)
+
+
+def _grasp_worker(seed):
+    dataset, neighborhood, alpha = _grasp_context
+    return grasp_construction(dataset, neighborhood, alpha, rd.Random(seed))
+
+
+def grasp_construction(dataset, neighborhood, alpha, rng):
+    """
+    GRASP的一次构造与局部搜索：从每个结点单独成社区出发，按随机顺序逐个考察结点，
+    候选为其所有邻接社区与留在原社区（delta为0），由delta_caused_by_move（此处由community_weight一次得到）排序，
+    delta不超过 min + alpha * (max - min) 且不使目标函数变差的候选构成受限候选列表(RCL)，从中随机选择一个；
+    构造完成后进行多层次的局部移动（multilevel_move）
+
+    :param dataset: 数据集
+    :param neighborhood: 邻域结构
+    :param alpha: 贪心程度，0为纯贪心，1为在所有不变差的候选中随机选择
+    :param rng: random.Random
+    :return: (目标函数值, 解)
+    """
+
+    obj = Frustration(dataset)
+    obj.update_objective_function()
+
+    order = list(range(dataset.vnum))
+    rng.shuffle(order)
+
+    for node in order:
+        current = obj.solution[node]
+        weight = obj.community_weight(node, neighborhood[node])
+        current_weight = weight.pop(current, 0)
+        if not weight:
+            continue
+
+        # 移动至社区c的delta为 current_weight - weight[c]，留在原社区为0
+        candidates = [(0, current)] + [(current_weight - w, cid) for cid, w in weight.items()]
+        min_delta = min(delta for delta, __ in candidates)
+        max_delta = max(delta for delta, __ in candidates)
+        threshold = min(min_delta + alpha * (max_delta - min_delta), 0)
+
+        delta, cid = rng.choice([candidate for candidate in candidates if candidate[0] <= threshold])
+        if cid != current:
+            obj.move(node, cid, delta)
+
+    LocalSearch(obj, neighborhood).multilevel_move()
+
+    return obj.obj_value, obj.solution
 
 
 class Initialization:
@@ -9,33 +74,42 @@ class Initialization:
     2. greedy_initialization，贪心策略，本质上是一趟的局部搜索；
     3. seed_initialization，先生成社区种子，然后将其余点归结至种子所在社区；
     4. lpa_initialization，基于几趟标签传播的初始解生成方式；
-    5. grasp_initialization，贪心随机自适应算法生成。
+    5. grasp_initialization，贪心随机自适应算法生成；
+    6. warm_start_initialization，沿用之前保存的解（热启动）；
+    7. spectral_initialization，符号拉普拉斯矩阵的谱嵌入 + k-means，利用网络的全局结构。
 
     """
 
     def __init__(self, dataset: utils.Dataset, neighborhood):
         self._dataset = dataset
         self.neighborhood = neighborhood
+        # grasp_initialization得到的精英解，[(目标函数值, 解)]
+        self.elite_solutions = []
 
     def standard_initialization(self):
         """
         将每个结点看作一个社区进行初始化。
 
-        :return: solution: dict, partition: dict(community: set())
+        :return: solution: np.ndarray, partition: Partition
         """
 
-        return utils.standard_initialize(self._dataset.vnum)
+        partition = Partition(np.arange(self._dataset.vnum, dtype=np.int32))
+        return partition.labels, partition
 
-    def greedy_initialization(self, obj_function):
+    def greedy_initialization(self, obj_function, multilevel=False):
         """
         思想源于Louvain算法：局部结点移动，与local_search中的local_move策略相同
 
         :param obj_function: 目标函数
-        :return:
+        :param multilevel: 是否在聚合后的网络上继续进行多层次的局部移动
+        :return: solution: np.ndarray, partition: Partition，即obj_function维护的解与划分
         """
 
         method = LocalSearch(obj_function, self.neighborhood)
-        method.local_move()
+        if multilevel:
+            method.multilevel_move()
+        else:
+            method.local_move()
         return method.objective_function.solution, method.objective_function.partition
 
     def seed_initialization(self, obj_function):
@@ -43,27 +117,114 @@ class Initialization:
         使用种子扩张的方式生成初始解
 
         :param obj_function: 目标函数类或其子类
-        :return: solution: dict, partition: dict(community: set())
+        :return: solution: np.ndarray, partition: Partition
         """
 
         import seed_expansion as sea
         seed_init = sea.SeedExpansion(self._dataset, self.neighborhood)
         return seed_init.seed_expansion(obj_function)
 
-    def lpa_initialization(self, max_iter=5):
+    def lpa_initialization(self, max_iter=5, mode='async', n_workers=None):
         """
         基于标签传播的初始解生成方式。
 
         :param max_iter: 最大迭代次数
-        :return: solution: dict, partition: dict(community: set())
+        :param mode: 标签更新方式，async、sync或semi-sync，见LabelPropagation.label_propagation
+        :param n_workers: sync与semi-sync模式下使用的进程数
+        :return: solution: np.ndarray, partition: Partition
         """
 
         import label_propagation_algorithm as lpa
         lpa_init = lpa.LabelPropagation(self._dataset, self.neighborhood)
-        return lpa_init.label_propagation(max_iter=max_iter, print_info=False)
+        return lpa_init.label_propagation(max_iter=max_iter, print_info=False, mode=mode, n_workers=n_workers)
+
+    def warm_start_initialization(self, warm_start):
+        """
+        热启动：沿用由utils.save_solution保存的解。网络与保存时不同（指纹不一致）时发出警告，新增的结点单独成社区。
+        社区重新编号为0..k-1，VNS等依赖社区编号连续的算法可以直接使用
+
+        :param warm_start: 文件名，或者dict、list、np.ndarray形式的解
+        :return: solution: np.ndarray, partition: Partition
+        """
+
+        if isinstance(warm_start, (str, os.PathLike)):
+            warm_start = utils.load_solution(warm_start, self._dataset)
+        partition = Partition.from_solution(warm_start, self._dataset.vnum).relabel()
+        return partition.labels, partition
+
+    def spectral_initialization(self, k, seed=None, solver='arpack'):
+        """
+        符号谱聚类：符号拉普拉斯矩阵 L̄ = D̄ - A（A为正边1、负边-1的邻接矩阵，D̄为正负度数之和）归一化为
+        I - D̄^(-1/2) A D̄^(-1/2)，取其最小的k个特征向量（即 D̄^(-1/2) A D̄^(-1/2) 最大的k个特征向量）作为嵌入，
+        每行单位化之后由k-means（k-means++初始化）分为k个社区。全部为scipy稀疏矩阵与向量化的运算
+
+        :param k: 社区的数目，空的聚类会被去掉，因此实际的社区数可能更少
+        :param seed: 随机种子
+        :param solver: arpack（scipy.sparse.linalg.eigsh）或lobpcg
+        :return: solution: np.ndarray, partition: Partition
+        """
+
+        graph = utils.SignedGraph.from_neighborhood(self.neighborhood)
+        pos, neg = graph.adjacency()
+        adjacency = (pos - neg).astype(np.float64)
+
+        degree = np.asarray(abs(adjacency).sum(axis=1)).reshape(-1)
+        inv_sqrt = np.zeros_like(degree)
+        inv_sqrt[degree > 0] = 1 / np.sqrt(degree[degree > 0])
+        scale = scipy.sparse.diags(inv_sqrt)
+        normalized = (scale @ adjacency @ scale).tocsr()
+
+        rng = np.random.RandomState(seed)
+        dim = min(k, graph.vnum - 1)
+        if solver == 'arpack':
+            __, vectors = scipy.sparse.linalg.eigsh(normalized, k=dim, which='LA', v0=rng.uniform(-1, 1, graph.vnum))
+        elif solver == 'lobpcg':
+            __, vectors = scipy.sparse.linalg.lobpcg(normalized, rng.standard_normal((graph.vnum, dim)), largest=True,
+                                                     tol=1e-5, maxiter=500)
+        else:
+            raise ValueError('unknown solver: ' + str(solver))
+
+        norm = np.linalg.norm(vectors, axis=1, keepdims=True)
+        embedding = vectors / np.where(norm > 0, norm, 1)
+
+        __, labels = scipy.cluster.vq.kmeans2(embedding, k, minit='++', seed=rng)
+
+        partition = Partition.from_solution(labels, self._dataset.vnum).relabel()
+        return partition.labels, partition
+
+    def grasp_initialization(self, n_solutions=8, alpha=0.3, elite_size=1, n_workers=None, seed=None):
+        """
+        GRASP：独立地构造n_solutions个随机贪心解（各自经过multilevel_move），返回其中最优的一个，
+        最优的elite_size个解按目标函数值从小到大存放在self.elite_solutions中，每一项为(目标函数值, 解)。
+        构造总是在紧凑形式的网络上进行，使用进程池时网络由utils.shared_dataset在各进程之间共享（fork与spawn均可），
+        因此结果与是否使用进程池无关
+
+        :param n_solutions: 构造的解的个数
+        :param alpha: RCL的贪心程度，0为纯贪心，1为在所有不变差的候选中随机选择
+        :param elite_size: 保留的精英解的个数
+        :param n_workers: 进程数，为None时在当前进程中依次构造
+        :param seed: 随机种子，给定时结果可复现，且与进程数无关
+        :return: solution: np.ndarray, partition: Partition
+        """
+
+        rng = rd.Random(seed)
+        seeds = [rng.getrandbits(32) for _ in range(n_solutions)]
+
+        compact = utils.dataset2compact(self._dataset)
+        if n_workers is None:
+            results = [grasp_construction(compact, compact.data, alpha, rd.Random(s)) for s in seeds]
+        else:
+            with utils.shared_dataset(compact) as shared, \
+                    utils.process_pool(n_workers, initializer=_init_grasp_worker,
+                                       initargs=(shared, alpha)) as pool:
+                results = list(pool.map(_grasp_worker, seeds))
+
+        # 值相同时保留序号最小的解
+        order = sorted(range(len(results)), key=lambda i: results[i][0])
+        self.elite_solutions = [results[i] for i in order[:elite_size]]
 
-    def grasp_initialization(self):
-        pass
+        partition = Partition.from_solution(self.elite_solutions[0][1])
+        return partition.labels, partition
 
 
 if __name__ == '__main__':
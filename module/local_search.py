@@ -1,6 +1,125 @@
 
 import random as rd
+import collections
+import numpy as np
+import scipy.sparse
+import scipy.sparse.linalg
+import signed_utils as utils
 from module.objective_function import ObjectiveFunction
+from module.frustration import WeightedFrustration
+from module.neighborhood import WeightedNeighborhood
+from module import profiling
+
+
+# 子进程中community_decompose所需的紧凑网络，由进程池的initializer设置，fork时直接继承
+_split_graph = None
+
+
+def _init_split_worker(graph):
+    global _split_graph
+    _split_graph = graph
+
+
+def _split_worker(nodes):
+    return bipartition(_split_graph, nodes)
+
+
+def bipartition(graph, nodes, dense_size=200, max_flips=2000):
+    """
+    将结点集合nodes的导出子图二分：导出子图的符号邻接矩阵A（正边为1，负边为-1）上，
+    被切断的边的 sum(A_ij) 恰为二分引起的frustration变化（正边被切断+1，负边被切断-1）。
+    对x ∈ {-1, 1}^n，切断的权重为 (sum(A) - xᵀAx) / 4，因此取A的最大特征值对应的特征向量的符号作为初始划分，
+    再逐个翻转使切断权重下降最多的结点（Kernighan–Lin式的局部改进），直到没有可以改进的结点
+
+    :param graph: utils.SignedGraph
+    :param nodes: 升序的结点编号数组
+    :param dense_size: 不超过该规模时使用稠密矩阵求特征向量，否则使用scipy.sparse.linalg.eigsh
+    :param max_flips: 局部改进中翻转结点的次数上限
+    :return: (较小一侧的结点, frustration的变化)，变化不为负时没有意义
+    """
+
+    size = nodes.size
+    entries = graph.row_entries(nodes)
+    src = np.repeat(np.arange(size), graph.indptr[nodes + 1] - graph.indptr[nodes])
+    dst = np.searchsorted(nodes, graph.indices[entries])
+    inside = (dst < size) & (nodes[np.minimum(dst, size - 1)] == graph.indices[entries])
+    adjacency = scipy.sparse.csr_matrix((graph.sign[entries][inside].astype(np.float64), (src[inside], dst[inside])),
+                                        shape=(size, size))
+    if adjacency.nnz == 0:
+        return nodes[:0], 0
+
+    if size <= dense_size:
+        vector = np.linalg.eigh(adjacency.toarray())[1][:, -1]
+    else:
+        try:
+            vector = scipy.sparse.linalg.eigsh(adjacency, k=1, which='LA', v0=np.ones(size))[1][:, 0]
+        except scipy.sparse.linalg.ArpackNoConvergence:
+            return nodes[:0], 0
+    x = np.where(vector < 0, -1.0, 1.0)
+
+    # gain[i]为翻转结点i引起的切断权重的变化
+    ax = adjacency @ x
+    gain = x * ax
+    for __ in range(min(size, max_flips)):
+        i = int(np.argmin(gain))
+        if gain[i] >= 0:
+            break
+        x[i] = -x[i]
+        start, end = adjacency.indptr[i], adjacency.indptr[i + 1]
+        nbr = adjacency.indices[start:end]
+        ax[nbr] += 2 * x[i] * adjacency.data[start:end]
+        gain[nbr] = x[nbr] * ax[nbr]
+        gain[i] = x[i] * ax[i]
+
+    delta = int(round((adjacency.sum() - x @ ax) / 4))
+    side = x > 0 if np.count_nonzero(x > 0) <= size // 2 else x < 0
+    if not side.any() or side.all():
+        return nodes[:0], 0
+
+    return nodes[side], delta
+
+
+class ActiveSet:
+    """
+    局部搜索的工作队列：deque保存待考察的结点，bytearray标记结点是否已在队列中，保证每个结点在队列中至多出现一次
+    """
+
+    def __init__(self, vnum, nodes=()):
+        self.__queue = collections.deque()
+        self.__in_queue = bytearray(vnum)
+        for node in nodes:
+            self.push(node)
+
+    def __len__(self):
+        return len(self.__queue)
+
+    def __bool__(self):
+        return bool(self.__queue)
+
+    def push(self, node):
+        if not self.__in_queue[node]:
+            self.__in_queue[node] = 1
+            self.__queue.append(node)
+
+    def pop(self):
+        node = self.__queue.popleft()
+        self.__in_queue[node] = 0
+        return node
+
+    def push_neighbors(self, node, node_neighborhood):
+        """
+        结点node发生移动后，将它的所有邻居加入队列
+
+        :param node: 发生移动的结点，带权网络中的自环不会把它自己加入队列
+        :param node_neighborhood: 结点node的邻域
+        :return: None
+        """
+
+        for key in ('+', '-'):
+            nbr = node_neighborhood[key]
+            for v in (nbr.tolist() if isinstance(nbr, np.ndarray) else nbr):
+                if v != node:
+                    self.push(v)
 
 
 class LocalSearch:
@@ -11,14 +130,65 @@ class LocalSearch:
         self.neighborhood = neighborhood
         self.sorted_node = self.__node_sort('')
 
-    def local_move(self):
+    def local_move(self, active_set=True, nodes=None):
         """
         结点逐个向邻居社区移动
 
-        :return:
+        :param active_set: 使用工作队列，只有邻居发生了移动的结点才会被重新考察；否则每一趟遍历所有结点
+        :param nodes: 可选，只从这些结点开始考察，默认为所有结点
+        :return: 是否有结点发生了移动
+        """
+
+        if nodes is None:
+            nodes = self.sorted_node
+
+        with profiling.phase('local_search.local_move'):
+            if active_set:
+                moves, scanned = self.__active_set_move(nodes)
+            else:
+                moves, scanned, passes = self.__sweep_move(nodes)
+                profiling.count('local_move.passes', passes)
+
+        profiling.count('local_move.nodes_scanned', scanned)
+        profiling.count('local_move.moves', moves)
+
+        return moves > 0
+
+    def __active_set_move(self, nodes):
+        """
+        :return: (移动的次数, 考察的结点数)
+        """
+
+        moves = 0
+        obj = self.objective_function
+        nbr = self.neighborhood
+
+        worklist = ActiveSet(len(nbr), nodes)
+        # 与逐趟遍历时最多100趟的上限相当
+        budget = limit = 100 * len(worklist)
+
+        while worklist and budget > 0:
+            budget -= 1
+            node = worklist.pop()
+
+            # 一次遍历邻居即可得到所有邻接社区的delta
+            candidate, min_delta = obj.best_move(node, nbr)
+
+            if candidate != -1 and min_delta < 0:
+                obj.move(node, candidate, min_delta)
+                worklist.push_neighbors(node, nbr[node])
+                moves += 1
+
+        return moves, limit - budget
+
+    def __sweep_move(self, nodes):
+        """
+        :return: (移动的次数, 考察的结点数, 趟数)
         """
 
         improvement = True
+        moves = 0
+        scanned = 0
         ct = 0
         obj = self.objective_function
         nbr = self.neighborhood
@@ -31,24 +201,58 @@ class LocalSearch:
 
             if ct >= 100:
                 break
-            for node in self.sorted_node:
+            scanned += len(nodes)
+            for node in nodes:
 
                 # if node % 10000 == 0:
                 #     print('Current node:', node)
 
-                min_delta = 0
-                candidate = -1
-
-                for nbr_community in obj.get_adjacent_community(node, nbr):
-
-                    delta = obj.delta_caused_by_move(node, nbr_community, nbr[node])
-                    if delta < min_delta:
-                        min_delta = delta
-                        candidate = nbr_community
+                # 一次遍历邻居即可得到所有邻接社区的delta
+                candidate, min_delta = obj.best_move(node, nbr)
 
-                if candidate != -1:
+                if candidate != -1 and min_delta < 0:
                     obj.move(node, candidate, min_delta)
                     improvement = True
+                    moves += 1
+
+        return moves, scanned, ct
+
+    def multilevel_move(self, max_level=10):
+        """
+        多层次的局部移动（Louvain）：local_move收敛后，将每个社区压缩为一个超结点，
+        在规模小得多的带权网络上继续进行局部移动，直到某一层没有结点移动为止。
+        聚合不改变frustration，因此目标函数值在各层之间保持精确
+
+        :param max_level: 最大聚合层数
+        :return: 是否有结点发生了移动
+        """
+
+        obj = self.objective_function
+        moved = self.local_move()
+
+        level_obj = obj
+        neighborhood = self.neighborhood
+        node2super = None
+
+        for level in range(max_level):
+            aggregated, super_node = utils.aggregate_network(neighborhood, level_obj.partition)
+            super_node = np.array(super_node)
+            node2super = super_node if node2super is None else super_node[node2super]
+
+            level_obj = WeightedFrustration(aggregated)
+            level_obj.update_objective_function()
+            neighborhood = WeightedNeighborhood(aggregated).neighborhood_structure
+
+            if not LocalSearch(level_obj, neighborhood).local_move():
+                break
+            moved = True
+
+        if node2super is not None:
+            # 将最后一层的划分映射回原网络
+            obj.set_solution(level_obj.solution[node2super])
+            obj.obj_value = level_obj.obj_value
+
+        return moved
 
     def community_merge(self):
         """
@@ -58,6 +262,19 @@ class LocalSearch:
         """
 
         obj = self.objective_function
+        built = obj.community_links is None
+        if built:
+            # 社区间的连边统计表在合并过程中由merge增量维护，合并时无需重新扫描社区成员；
+            # 合并结束后关闭，之后的move不再为维护它付出代价
+            obj.build_community_links(self.neighborhood)
+        try:
+            self.__merge_communities(obj)
+        finally:
+            if built:
+                obj.drop_community_links()
+
+    def __merge_communities(self, obj):
+        # 依次考察每个社区，与delta最小的邻接社区合并，被合并过的社区不再参与
         community_list = list(obj.partition.keys())
         tabu_list = set()
         # rd.shuffle(community_list)
@@ -83,13 +300,38 @@ class LocalSearch:
                 tabu_list.add(c1)
                 tabu_list.add(candidate)
 
-    def community_decompose(self):
+    def community_decompose(self, min_size=3, n_workers=None, parallel_size=2000):
         """
-        社区分解
+        社区分解：将每个社区二分（见bipartition），frustration减少时把较小的一半移入新的社区。
+        二分引起的变化只与社区的导出子图有关，各个社区的二分互不影响，
+        因此规模不小于parallel_size的社区可以分给n_workers个进程同时计算，之后统一应用
 
-        :return:
+        :param min_size: 参与分解的社区的最小规模
+        :param n_workers: 进程数，为None时在当前进程中依次计算
+        :param parallel_size: 分给进程池计算的社区的最小规模
+        :return: 是否有社区被分解
         """
-        pass
+
+        obj = self.objective_function
+        graph = utils.SignedGraph.from_neighborhood(self.neighborhood)
+        communities = [np.array(sorted(members)) for members in obj.partition.values() if len(members) >= min_size]
+
+        large = [nodes for nodes in communities if nodes.size >= parallel_size] if n_workers is not None else []
+        splits = [bipartition(graph, nodes) for nodes in communities if n_workers is None or nodes.size < parallel_size]
+        if large:
+            with utils.process_pool(n_workers, initializer=_init_split_worker, initargs=(graph, )) as pool:
+                splits.extend(pool.map(_split_worker, large))
+
+        split = False
+        for part, delta in splits:
+            if delta < 0:
+                destination = obj.partition.new_community()
+                for node in part.tolist():
+                    obj.move(node, destination, 0)
+                obj.obj_value += delta
+                split = True
+
+        return split
 
     def __node_sort(self, sort_type):
         """
@@ -8,7 +8,11 @@ class Neighborhood:
 
     def __init__(self, dataset: utils.Dataset):
         self._dataset = dataset
-        self.neighborhood_structure = self.__collect_neighbor_info()
+        if isinstance(dataset.data, utils.SignedGraph):
+            # 紧凑形式的数据集本身已经将正负邻居分开存储，无需再复制一份
+            self.neighborhood_structure = dataset.data
+        else:
+            self.neighborhood_structure = self.__collect_neighbor_info()
 
     def __collect_neighbor_info(self) -> dict:
         """
@@ -68,3 +72,29 @@ class Neighborhood:
             }
 
         return nbr_structure
+
+
+class WeightedNeighborhood:
+
+    def __init__(self, dataset: utils.Dataset):
+        """
+        带权网络（由utils.aggregate_network生成）的邻域结构
+
+        :param dataset: data[u][v] = [正边权, 负边权]
+        """
+        self._dataset = dataset
+        self.neighborhood_structure = self.__collect_neighbor_info()
+
+    def __collect_neighbor_info(self) -> dict:
+        """
+        :return: 一个字典，{节点编号：{'+': {正邻居: 权}, '-': {负邻居: 权}}}，两个结点之间可以同时有正边与负边
+        """
+        neighbors = dict()
+        for i in range(self._dataset.vnum):
+            row = self._dataset.data.get(i, {})
+            neighbors[i] = {
+                '+': {v: pos for v, (pos, neg) in row.items() if pos},
+                '-': {v: neg for v, (pos, neg) in row.items() if neg}
+            }
+
+        return neighbors
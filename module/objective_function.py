@@ -1,8 +1,12 @@
 import signed_utils as utils
+from module.partition import Partition
 
 
 class ObjectiveFunction:
 
+    community_links = None
+    checkpoint_value = None
+
     def __init__(self, dataset: utils.Dataset, init_solution=None):
         """
         初始化流程
@@ -15,20 +19,55 @@ class ObjectiveFunction:
         self.obj_value = - 2 << 32
 
         if init_solution is None:
-            self.solution, self.partition = utils.standard_initialize(self._dataset.vnum)
+            self.partition = Partition.singletons(self._dataset.vnum)
         else:
-            self.solution = init_solution
-            self.partition = utils.solution2partition(init_solution)
+            self.partition = Partition.from_solution(init_solution, self._dataset.vnum)
+
+    @property
+    def solution(self):
+        """
+        当前解，np.ndarray(int32)，与partition由同一个Partition维护
+
+        :return: partition.labels
+        """
+        return self.partition.labels
 
     def set_solution(self, solution):
         """
-        更改当前解
+        更改当前解，传入的解会被复制
 
-        :param solution: 想要修改成的解
+        :param solution: 想要修改成的解，dict、list或np.ndarray
         :return: None
         """
-        self.solution = solution
-        self.partition = utils.solution2partition(solution)
+        previous = self.partition
+        self.partition = Partition.from_solution(solution, self._dataset.vnum)
+        self.partition.inherit_journal(previous)
+
+    def checkpoint(self):
+        """
+        保存当前解与目标函数值，之后可以用rollback回到这里，开销与上一个checkpoint之后的改动数目成正比
+
+        :return: None
+        """
+        self.partition.checkpoint()
+        self.checkpoint_value = self.obj_value
+
+    def rollback(self):
+        """
+        撤销上一个checkpoint之后的所有move与merge，目标函数值同时恢复
+
+        :return: None
+        """
+        self.partition.rollback()
+        self.obj_value = self.checkpoint_value
+
+    def best(self):
+        """
+        :return: (上一个checkpoint时的解, 目标函数值)，解为只读的np.ndarray，需要保留时请复制
+        """
+        if self.partition.journal is None:
+            return self.solution, self.obj_value
+        return self.partition.best(), self.checkpoint_value
 
     def update_objective_function(self):
         """
@@ -54,9 +93,46 @@ class ObjectiveFunction:
     def merge(self, c1, c2, delta):
         pass
 
+    def build_community_links(self, neighborhood):
+        pass
+
+    def drop_community_links(self):
+        """
+        关闭社区间的连边统计表，之后的move与merge不再维护它
+
+        :return: None
+        """
+        self.community_links = None
+
     def delta_caused_by_merge(self, c1, c2, neighborhood):
         pass
 
+    def best_move(self, node, neighborhood, n_clusters=None):
+        """
+        # 在结点node的邻接社区中找到使目标函数最小的移动
+
+        :param node: 结点序号
+        :param neighborhood: 数据集的邻域结构
+        :param n_clusters: 可选，社区编号的范围为range(n_clusters)时，另外考虑一个不与node相邻的社区
+        :return: (目标社区, 引起的变化)，没有候选社区时目标社区为-1
+        """
+
+        candidates = self.get_adjacent_community(node, neighborhood)
+        if n_clusters is not None:
+            current = self.solution[node]
+            other = next((cid for cid in range(n_clusters) if cid != current and cid not in candidates), -1)
+            if other != -1:
+                candidates.add(other)
+
+        candidate, min_delta = -1, 0
+        for nbr_community in candidates:
+            delta = self.delta_caused_by_move(node, nbr_community, neighborhood[node])
+            if candidate == -1 or delta < min_delta:
+                min_delta = delta
+                candidate = nbr_community
+
+        return candidate, min_delta
+
     def get_adjacent_community(self, node, neighborhood) -> set:
         """
         # 找到结点node的邻接社区
@@ -65,8 +141,9 @@ class ObjectiveFunction:
         :param node: 结点序号
         :return: 其邻接社区
         """
-        nbr = neighborhood[node]['+'] | neighborhood[node]['-']
-        nbr_community = set([self.solution[i] for i in nbr])
+        sl = self.solution
+        nbr_community = {sl[i] for i in neighborhood[node]['+']}
+        nbr_community.update(sl[i] for i in neighborhood[node]['-'])
         # when the element doesn't exist, discard would not raise KeyError
         nbr_community.discard(self.solution[node])
 
@@ -87,7 +164,8 @@ class ObjectiveFunction:
         # the algorithm to find neighbor communities is inefficient
 
         for node in self.partition[cid]:
-            adjacent_node = adjacent_node | neighborhood[node]['+'] | neighborhood[node]['-']
+            adjacent_node.update(neighborhood[node]['+'])
+            adjacent_node.update(neighborhood[node]['-'])
 
         adjacent_community = set([self.solution[i] for i in adjacent_node])
         adjacent_community.discard(cid)
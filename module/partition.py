@@ -0,0 +1,240 @@
+import numpy as np
+import signed_utils as utils
+
+
+class Partition(dict):
+    """
+    解与划分的统一表示：
+
+    * 作为dict使用时为划分，{社区编号: 社区成员的集合}，与原先的partition用法一致；
+    * labels为解，np.ndarray(int32)，第i个元素为结点i的社区编号。
+
+    两者由move与merge同步维护，二者都是O(1)/O(社区规模)的操作。不要直接修改labels或者dict中的集合。
+
+    调用checkpoint之后开启撤销日志：每次move与merge都会记录一条日志，
+    rollback回到上一个checkpoint、checkpoint保存当前状态、best取得保存的解，开销都只与两次checkpoint之间的改动数目成正比。
+    """
+
+    # 撤销日志，None表示没有开启；MOVE项为(MOVE, 结点, 原社区)，MERGE项为(MERGE, c1, c2, c2的成员)
+    MOVE, MERGE = 0, 1
+    journal = None
+    __saved = None
+
+    def __init__(self, labels):
+        super().__init__()
+        self.labels = labels
+        self.__group()
+
+    @classmethod
+    def from_solution(cls, solution, vnum=None):
+        """
+        由dict、list或np.ndarray形式的解构造，总是复制一份，不与传入的解共享内存
+
+        :param solution: 解
+        :param vnum: 结点个数，solution为dict时必须给出
+        :return: Partition
+        """
+
+        if vnum is None:
+            vnum = len(solution)
+        labels = np.array(utils.solution2array(solution, vnum), dtype=np.int32)
+        return cls(labels)
+
+    @classmethod
+    def singletons(cls, vnum):
+        """
+        每个结点单独成社区
+
+        :param vnum: 结点个数
+        :return: Partition
+        """
+
+        return cls(np.arange(vnum, dtype=np.int32))
+
+    def __group(self):
+        # 排序后相同社区的结点是连续的一段，每个社区只需一次切片
+        order = np.argsort(self.labels, kind='stable')
+        sorted_labels = self.labels[order]
+        bounds = np.flatnonzero(sorted_labels[1:] != sorted_labels[:-1]) + 1
+        starts = [0] + bounds.tolist()
+        ends = bounds.tolist() + [order.size]
+        for start, end in zip(starts, ends):
+            if start < end:
+                self[int(sorted_labels[start])] = set(order[start:end].tolist())
+
+    def size(self, cid):
+        return len(self[cid]) if cid in self else 0
+
+    def move(self, node, destination):
+        """
+        将结点node移动至社区destination，原社区为空时删除
+
+        :param node: 结点编号
+        :param destination: 目标社区，不存在时新建
+        :return: 结点原来所在的社区
+        """
+
+        source = int(self.labels[node])
+        if self.journal is not None:
+            self.journal.append((Partition.MOVE, node, source))
+        self.labels[node] = destination
+
+        members = self[source]
+        members.remove(node)
+        if not members:
+            del self[source]
+
+        if destination in self:
+            self[destination].add(node)
+        else:
+            self[destination] = {node}
+
+        return source
+
+    def merge(self, c1, c2):
+        """
+        将社区c2合并至社区c1，较小的集合并入较大的集合
+
+        :param c1: 保留的社区
+        :param c2: 被合并的社区
+        :return: None
+        """
+
+        members = self.pop(c2)
+        if self.journal is not None:
+            self.journal.append((Partition.MERGE, c1, c2, list(members)))
+        self.labels[list(members)] = c1
+
+        if len(members) > len(self[c1]):
+            members, self[c1] = self[c1], members
+        self[c1].update(members)
+
+    def checkpoint(self):
+        """
+        保存当前状态，之后的rollback会回到这里。第一次调用时复制一份labels，之后只更新日志中改动过的结点
+
+        :return: None
+        """
+
+        if self.__saved is None or self.journal is None:
+            self.__saved = self.labels.copy()
+        else:
+            for entry in self.journal:
+                nodes = entry[1] if entry[0] == Partition.MOVE else entry[3]
+                self.__saved[nodes] = self.labels[nodes]
+        self.journal = []
+
+    def rollback(self):
+        """
+        按日志逆序撤销上一个checkpoint之后的所有move与merge
+
+        :return: None
+        """
+
+        while self.journal:
+            self.undo()
+
+    def undo(self):
+        """
+        撤销日志中的最后一次操作
+
+        :return: 被撤销的日志项
+        """
+
+        entry = self.journal.pop()
+        if entry[0] == Partition.MOVE:
+            __, node, source = entry
+            destination = int(self.labels[node])
+            self.labels[node] = source
+
+            members = self[destination]
+            members.remove(node)
+            if not members:
+                del self[destination]
+            if source in self:
+                self[source].add(node)
+            else:
+                self[source] = {node}
+        else:
+            __, c1, c2, members = entry
+            self.labels[members] = c2
+            self[c1].difference_update(members)
+            self[c2] = set(members)
+
+        return entry
+
+    def best(self):
+        """
+        :return: 上一个checkpoint时的解，只读；没有checkpoint时为当前解
+        """
+
+        if self.journal is None:
+            return self.labels
+        return self.__saved
+
+    def inherit_journal(self, previous):
+        """
+        整体替换解时（例如set_solution）接续previous的日志：与previous不同的结点各记为一次move，
+        这样rollback仍然可以回到previous的checkpoint
+
+        :param previous: 被替换的Partition
+        :return: None
+        """
+
+        if previous.journal is None:
+            return
+        changed = np.flatnonzero(previous.labels != self.labels).tolist()
+        self.__saved = previous.__saved
+        self.journal = previous.journal + [(Partition.MOVE, node, int(previous.labels[node])) for node in changed]
+
+    def grow(self, vnum):
+        """
+        增加结点至vnum个，新结点各自单独成社区，社区编号接在现有编号之后
+
+        :param vnum: 新的结点个数
+        :return: None
+        """
+
+        old = self.labels.size
+        if vnum <= old:
+            return
+
+        first = self.new_community()
+        added = np.arange(first, first + vnum - old, dtype=self.labels.dtype)
+        self.labels = np.concatenate([self.labels, added])
+        self.update((cid, {node}) for node, cid in zip(range(old, vnum), added.tolist()))
+        if self.__saved is not None:
+            # 新结点不在日志中，视作上一个checkpoint时就已存在
+            self.__saved = np.concatenate([self.__saved, added])
+
+    def new_community(self):
+        """
+        :return: 一个当前没有被使用的社区编号
+        """
+
+        return max(self.keys(), default=-1) + 1
+
+    def relabel(self):
+        """
+        重新编号，让社区号从0开始并逐一递增（按原编号的大小顺序）。不记录日志，不要在开启撤销日志时调用
+
+        :return: self
+        """
+
+        old, labels = np.unique(self.labels, return_inverse=True)
+        self.labels[:] = labels.reshape(-1)
+
+        members = [self.pop(cid) for cid in old.tolist()]
+        self.update(enumerate(members))
+
+        return self
+
+    def copy(self):
+        """
+        :return: 当前划分的副本，不包含撤销日志
+        """
+
+        partition = Partition.__new__(Partition)
+        partition.labels = self.labels.copy()
+        partition.update((cid, set(members)) for cid, members in self.items())
+        return partition
@@ -0,0 +1,196 @@
+import os
+import sys
+import json
+import time
+import atexit
+import functools
+import contextlib
+import collections
+
+
+"""
+热点路径的计数器与计时器，默认关闭，关闭时几乎没有开销：
+
+    * 目标函数的方法（delta_caused_by_move、best_move、move、merge、objective_function）由enable()替换为计数的版本，
+      disable()时换回原来的方法，关闭时不经过任何包装；
+    * 局部搜索在循环中只累加局部变量，结束时调用一次count；
+    * 各个算法的阶段由phase(name)计时，关闭时返回同一个空的上下文管理器。
+
+开启方式，不需要修改代码：
+
+    SB_PROFILE=1 python variable_neighborhood_search.py            # 结束时把统计结果输出至stderr
+    SB_PROFILE=trace.json python variable_neighborhood_search.py   # 结束时把统计结果写入JSON文件
+
+或者在代码中调用 profiling.enable()，之后由 profiling.stats 取得统计结果。
+多进程运行时（例如RelocationHeuristic.run_parallel），子进程中的统计不会汇总到父进程。
+"""
+
+
+class Stats:
+    """
+    计数器与计时器的集合
+
+    counters: {名称: 次数}
+    timers: {名称: [总时间(秒), 次数]}
+    """
+
+    def __init__(self):
+        self.counters = collections.Counter()
+        self.timers = collections.defaultdict(lambda: [0.0, 0])
+
+    def reset(self):
+        self.counters.clear()
+        self.timers.clear()
+
+    def count(self, name, n=1):
+        self.counters[name] += n
+
+    def add_time(self, name, seconds):
+        timer = self.timers[name]
+        timer[0] += seconds
+        timer[1] += 1
+
+    @contextlib.contextmanager
+    def timer(self, name):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add_time(name, time.perf_counter() - start)
+
+    def as_dict(self):
+        """
+        :return: {'counters': {名称: 次数}, 'timers': {名称: {'total': 总时间, 'calls': 次数}}}
+        """
+
+        return {
+            'counters': dict(sorted(self.counters.items())),
+            'timers': {name: {'total': total, 'calls': calls} for name, (total, calls) in sorted(self.timers.items())}
+        }
+
+    def to_json(self, file_name):
+        with open(file_name, 'w') as f:
+            json.dump(self.as_dict(), f, indent=2)
+
+    def report(self):
+        """
+        :return: 便于阅读的统计结果
+        """
+
+        lines = ['%-40s %12s %12s' % ('timer', 'seconds', 'calls')]
+        for name, (total, calls) in sorted(self.timers.items(), key=lambda x: -x[1][0]):
+            lines.append('%-40s %12.4f %12d' % (name, total, calls))
+        lines.append('%-40s %12s' % ('counter', 'count'))
+        for name, value in sorted(self.counters.items()):
+            lines.append('%-40s %12d' % (name, value))
+        return '\n'.join(lines)
+
+
+# 全局的统计结果
+stats = Stats()
+
+# 被计数的目标函数方法，其中objective_function同时计时
+COUNTED_METHODS = ('delta_caused_by_move', 'best_move', 'move', 'merge', 'objective_function')
+TIMED_METHODS = ('objective_function', )
+
+_enabled = False
+_patched = []
+_null_context = contextlib.nullcontext()
+
+
+def enabled():
+    return _enabled
+
+
+def count(name, n=1):
+    """
+    开启时累加计数器，关闭时什么也不做。只应在循环之外调用
+    """
+
+    if _enabled:
+        stats.counters[name] += n
+
+
+def phase(name):
+    """
+    算法阶段的计时器：with profiling.phase('vns.perturbation'): ...
+
+    :return: 开启时为计时的上下文管理器，关闭时为空的上下文管理器
+    """
+
+    return stats.timer(name) if _enabled else _null_context
+
+
+def enable():
+    """
+    开启统计：将Frustration与WeightedFrustration中的方法替换为计数的版本
+
+    :return: stats
+    """
+
+    global _enabled
+    if _enabled:
+        return stats
+
+    from module.frustration import Frustration, WeightedFrustration
+
+    for cls in (Frustration, WeightedFrustration):
+        for name in COUNTED_METHODS:
+            if name in cls.__dict__:
+                original = cls.__dict__[name]
+                _patched.append((cls, name, original))
+                setattr(cls, name, _instrument(original, '%s.%s' % (cls.__name__, name), name in TIMED_METHODS))
+
+    _enabled = True
+    return stats
+
+
+def disable():
+    """
+    关闭统计，换回原来的方法，已有的统计结果保留
+
+    :return: None
+    """
+
+    global _enabled
+    while _patched:
+        cls, name, original = _patched.pop()
+        setattr(cls, name, original)
+    _enabled = False
+
+
+def _instrument(method, key, timed):
+    counters = stats.counters
+
+    if timed:
+        @functools.wraps(method)
+        def wrapper(*args, **kwargs):
+            counters[key] += 1
+            start = time.perf_counter()
+            try:
+                return method(*args, **kwargs)
+            finally:
+                stats.add_time(key, time.perf_counter() - start)
+    else:
+        @functools.wraps(method)
+        def wrapper(*args, **kwargs):
+            counters[key] += 1
+            return method(*args, **kwargs)
+
+    return wrapper
+
+
+def _enable_from_environment():
+    setting = os.environ.get('SB_PROFILE', '')
+    if not setting or setting == '0':
+        return
+
+    enable()
+
+    def dump():
+        if setting.endswith('.json'):
+            stats.to_json(setting)
+        else:
+            print(stats.report(), file=sys.stderr)
+
+    atexit.register(dump)
@@ -0,0 +1,83 @@
+import time
+
+
+class Termination:
+    """
+    元启发式算法的停止条件，满足任意一个即停止：
+    1. max_iter，迭代次数；
+    2. time_budget，墙钟时间（秒）；
+    3. max_no_improvement，连续没有改进最优值的迭代次数；
+    4. callback(elapsed, iteration, value, best)，每次迭代之后调用，返回True时停止。
+
+        termination = Termination(time_budget=60, callback=print_progress).start()
+        while not termination.stop():
+            ...
+            termination.update(value, best)
+    """
+
+    def __init__(self, max_iter=None, time_budget=None, max_no_improvement=None, callback=None):
+        if max_iter is None and time_budget is None and max_no_improvement is None and callback is None:
+            raise ValueError('at least one of max_iter, time_budget, max_no_improvement and callback must be given')
+
+        self.max_iter = max_iter
+        self.time_budget = time_budget
+        self.max_no_improvement = max_no_improvement
+        self.callback = callback
+        self.start()
+
+    def start(self):
+        """
+        开始计时，迭代次数清零
+
+        :return: self
+        """
+
+        self.start_time = time.perf_counter()
+        self.iteration = 0
+        self.no_improvement = 0
+        self.best = None
+        self.interrupted = False
+        return self
+
+    @property
+    def elapsed(self):
+        return time.perf_counter() - self.start_time
+
+    def update(self, value, best):
+        """
+        一次迭代结束
+
+        :param value: 这次迭代得到的目标函数值
+        :param best: 目前的最优值
+        :return: 是否应当停止
+        """
+
+        self.iteration += 1
+        if self.best is None or best < self.best:
+            self.best = best
+            self.no_improvement = 0
+        else:
+            self.no_improvement += 1
+
+        if self.callback is not None and self.callback(self.elapsed, self.iteration, value, best):
+            self.interrupted = True
+
+        return self.stop()
+
+    def stop(self):
+        """
+        :return: 是否满足停止条件
+        """
+
+        return self.interrupted \
+            or (self.max_iter is not None and self.iteration >= self.max_iter) \
+            or (self.time_budget is not None and self.elapsed >= self.time_budget) \
+            or (self.max_no_improvement is not None and self.no_improvement >= self.max_no_improvement)
+
+
+def print_progress(elapsed, iteration, value, best):
+    """
+    可以作为callback使用，每次迭代输出一行进度
+    """
+
+    print('%8.2fs  iteration %-6d value %-10d best %d' % (elapsed, iteration, value, best))
@@ -1,5 +1,8 @@
-import time
+import os
+import warnings
+import collections
 import random as rd
+import numpy as np
 import signed_utils as utils
 from module import *
 
@@ -11,21 +14,43 @@ from module import *
 """
 
 
+# 子进程中的RelocationHeuristic，由进程池的initializer在共享的数据集（见utils.shared_dataset）上建立
+_worker_heuristic = None
+
+
+def _init_worker(dataset, k, warm_start):
+    global _worker_heuristic
+    _worker_heuristic = RelocationHeuristic(dataset, k, warm_start)
+
+
+def _relocation_worker(seed, warm=False):
+    # 每次启动使用独立的随机种子，结果与由哪个进程执行无关
+    rd.seed(seed)
+    init_solution = _worker_heuristic.warm_start_solution() if warm else None
+    solution, value = _worker_heuristic.relocation_heuristic(init_solution)
+    return value, solution
+
+
 class RelocationHeuristic:
 
-    def __init__(self, dataset: utils.Dataset, k):
+    def __init__(self, dataset: utils.Dataset, k, warm_start=None):
         """
         算法执行必要的一些参数，用于初始化
 
         :param dataset: 数据集，由utils中读入并自定义
         :param k: cluster的数目
+        :param warm_start: 可选，由utils.save_solution保存的解（文件名）或解本身，第一次启动时代替随机的exemplars
         """
         self.k = k
+        self.warm_start = warm_start
         self._dataset = dataset
         self._neighborhood = Neighborhood(dataset).neighborhood_structure
         self.obj_function = None
         self.best_solution = None
         self.best_value = 2 << 64
+        # 符号邻接矩阵与邻居签名，第一次启动时建立，之后的启动（包括fork出的子进程）共享
+        self._adjacency = None
+        self._signature = None
 
     def neighborhood_similarity(self, u, v):
         """
@@ -35,8 +60,31 @@ class RelocationHeuristic:
         :param v: 另一个结点的编号
         :return: 二者的相似度
         """
-        return len(self._neighborhood[u]['+'] & self._neighborhood[v]['+']) + \
-            len(self._neighborhood[u]['-'] & self._neighborhood[v]['-'])
+        nbr = self._neighborhood
+        return len(set(nbr[u]['+']).intersection(nbr[v]['+'])) + \
+            len(set(nbr[u]['-']).intersection(nbr[v]['-']))
+
+    def signed_adjacency(self):
+        """
+        正负邻接矩阵与每个结点的邻居签名，只计算一次。
+        签名为 随机权重在正邻居上的和 + 另一组随机权重在负邻居上的和（uint64，溢出回绕），边集相同的结点签名一定相同
+
+        :return: (A⁺, A⁻, signature)
+        """
+
+        if self._adjacency is None:
+            graph = utils.SignedGraph.from_neighborhood(self._neighborhood)
+            self._adjacency = graph.adjacency()
+
+            weights = np.random.RandomState(0).randint(1, 1 << 63, size=(2, graph.vnum), dtype=np.int64)
+            weights = weights.astype(np.uint64)
+            entry_weight = np.where(graph.sign > 0, weights[0][graph.indices], weights[1][graph.indices])
+            self._signature = np.zeros(graph.vnum, dtype=np.uint64)
+            nonempty = np.flatnonzero(np.diff(graph.indptr))
+            if nonempty.size:
+                self._signature[nonempty] = np.add.reduceat(entry_weight, graph.indptr[nonempty])
+
+        return self._adjacency[0], self._adjacency[1], self._signature
 
     def random_select(self):
         """
@@ -47,40 +95,85 @@ class RelocationHeuristic:
         # A check is made to assure that no two vertices having the exact
         # same edge set are selected
 
-        exemplar = set(rd.sample(range(self._dataset.vnum), self.k))
+        __, __, signature = self.signed_adjacency()
+        if np.unique(signature).size < self.k:
+            warnings.warn('fewer distinct edge sets than k, exemplars may share the same edge set')
+            return set(rd.sample(range(self._dataset.vnum), self.k))
+
+        exemplar, used = set(), set()
+        while len(exemplar) < self.k:
+            for vertex in rd.sample(range(self._dataset.vnum), self.k - len(exemplar)):
+                if vertex not in exemplar and signature[vertex] not in used:
+                    exemplar.add(vertex)
+                    used.add(signature[vertex])
 
         return exemplar
 
     def initialization(self, exemplar):
         """
-        根据随机选择的初始核进行解的构造
+        根据随机选择的初始核进行解的构造：每个结点归入相似度（公共正邻居数 + 公共负邻居数）最大的exemplar。
+        所有结点与exemplar的相似度由一次稀疏矩阵乘法 A⁺·A⁺[exemplar]ᵀ + A⁻·A⁻[exemplar]ᵀ 得到，
+        与neighborhood_similarity的定义相同；相似度相同时取编号最小的exemplar，全为0时为exemplar 0
 
         :param exemplar: 由random_select()返回的随机选择的初始核心
-        :return: 构造的初始解向量
+        :return: 构造的初始解向量，np.ndarray
         """
 
-        init_solution = dict.fromkeys(range(self._dataset.vnum), -1)
-        remain = set(range(self._dataset.vnum)) - exemplar
+        pos, neg, __ = self.signed_adjacency()
+        exemplar = list(exemplar)
 
-        for idx, vertex in enumerate(exemplar):
-            init_solution[vertex] = idx
+        similarity = (pos @ pos[exemplar].T + neg @ neg[exemplar].T).tocsr()
+        similarity.sum_duplicates()
+        init_solution = np.asarray(similarity.argmax(axis=1)).reshape(-1).astype(np.int32)
+        init_solution[np.asarray(similarity.max(axis=1).todense()).reshape(-1) <= 0] = 0
 
-        for vertex in remain:
-            similarity = [self.neighborhood_similarity(vertex, u) for u in exemplar]
-            idx, __ = max(enumerate(similarity), key=lambda x: x[1])
-            init_solution[vertex] = idx
+        init_solution[exemplar] = np.arange(len(exemplar), dtype=np.int32)
 
         return init_solution
 
-    def relocation_heuristic(self):
+    def warm_start_solution(self):
+        """
+        将热启动的解化为k个cluster：保留最大的k个社区并编号为0..k-1，
+        其余结点逐个归入与其 正边数 - 负边数 最大的保留社区，没有这样的社区时归入cluster 0
+
+        :return: np.ndarray，取值范围为range(k)
+        """
+
+        labels = Initialization(self._dataset, self._neighborhood).warm_start_initialization(self.warm_start)[0]
+        __, inverse, counts = np.unique(labels, return_inverse=True, return_counts=True)
+        inverse = inverse.reshape(-1)
+
+        # 社区按规模从大到小排列，相同规模时编号小的在前
+        rank = np.empty(counts.size, dtype=np.int32)
+        rank[np.argsort(-counts, kind='stable')] = np.arange(counts.size, dtype=np.int32)
+        solution = rank[inverse]
+
+        remain = np.flatnonzero(solution >= self.k).tolist()
+        solution[remain] = -1
+        for vertex in remain:
+            weight = collections.defaultdict(int)
+            for u in self._neighborhood[vertex]['+']:
+                weight[solution[u]] += 1
+            for u in self._neighborhood[vertex]['-']:
+                weight[solution[u]] -= 1
+            weight.pop(-1, None)
+            cid, w = max(weight.items(), key=lambda x: x[1], default=(0, 0))
+            solution[vertex] = cid if w > 0 else 0
+
+        return solution
+
+    def relocation_heuristic(self, init_solution=None):
         """
         算法主要流程
 
+        :param init_solution: 可选的初始解，取值范围为range(k)，默认由随机选择的exemplars构造
         :return: 一个locally optimal solution
         """
         # initialize solution
-        exemplar = self.random_select()
-        init_solution = self.initialization(exemplar)
+        if init_solution is None:
+            with profiling.phase('rh.initialization'):
+                exemplar = self.random_select()
+                init_solution = self.initialization(exemplar)
 
         # set objective function
         self.obj_function = Frustration(dataset=self._dataset, init_solution=init_solution)
@@ -89,58 +182,123 @@ class RelocationHeuristic:
 
         # ## start relocation heuristic ## #
 
-        improvement = False
+        with profiling.phase('rh.relocation'):
+            # 工作队列：只有邻居发生了移动（或所在社区不再只有自己）的结点才需要重新考察
+            worklist = ActiveSet(self._dataset.vnum, range(self._dataset.vnum))
 
-        while not improvement:
-            improvement = True
-
-            for v in range(self._dataset.vnum):
+            while worklist:
+                v = worklist.pop()
                 h = obj.solution[v]
 
                 # try to find the best movement
                 if len(obj.partition[h]) > 1:
 
-                    for cid in set(range(self.k)) - {h}:
-                        delta = obj.delta_caused_by_move(node=v, destination=cid, node_neighborhood=self._neighborhood[v])
-                        # make sure the increment is correct
+                    # 只考虑邻接社区与一个不相邻的社区，一次遍历邻居即可得到所有候选的delta
+                    cid, delta = obj.best_move(v, self._neighborhood, n_clusters=self.k)
 
-                        if delta < 0:
-                            obj.move(v, cid, delta=delta)
-                            improvement = False
+                    if cid != -1 and delta < 0:
+                        if obj.partition.size(cid) == 1:
+                            # 原本只有一个结点的社区，其中的结点从此可以移动
+                            worklist.push(next(iter(obj.partition[cid])))
+                        obj.move(v, cid, delta=delta)
+                        worklist.push_neighbors(v, self._neighborhood[v])
 
         # ## end relocation heuristic ## #
 
         return obj.solution, obj.obj_value
 
-    def run(self, time_limit, is_print=True):
+    def run(self, time_limit=None, is_print=False, time_budget=None, max_no_improvement=None, callback=None):
         """
-        算法的运行函数，采用Multi-start的形式单线程运行
+        算法的运行函数，采用Multi-start的形式单线程运行，满足任意一个停止条件即停止
 
-        :param time_limit: 时间限制或者迭代次数限制
+        :param time_limit: 启动次数的限制
         :param is_print: 是否打印运行过程中的信息
-        :return:
+        :param time_budget: 墙钟时间限制（秒），在两次启动之间检查
+        :param max_no_improvement: 连续没有改进的启动次数限制
+        :param callback: callback(elapsed, iteration, value, best)，每次启动之后调用，返回True时停止
+        :return: 最优的目标函数值
         """
 
-        print('Start Multi-start Relocation Heuristic...')
-        t = 0
-        start_time = time.time()
-        while t < time_limit:
-            if is_print:
-                print('--> Current iteration: %d/%d' % (t, time_limit))
-            solution, value = self.relocation_heuristic()
+        if is_print:
+            print('Start Multi-start Relocation Heuristic...')
+            if callback is None:
+                callback = print_progress
+        termination = Termination(time_limit, time_budget, max_no_improvement, callback)
+
+        while not termination.stop():
+            # 热启动只用于第一次启动，其余启动仍从随机的exemplars出发
+            warm = termination.iteration == 0 and self.warm_start is not None
+            solution, value = self.relocation_heuristic(self.warm_start_solution() if warm else None)
 
             if value < self.best_value:
                 self.best_value = value
                 self.best_solution = solution
 
-            t += 1
-            if is_print:
-                print('---> Locally optimal value:', value)
+            termination.update(value, self.best_value)
+
+        if is_print:
+            print('Multi-start Relocation Heuristic Complete!')
+            print('Running time:', termination.elapsed)
+            print('Best value:', self.best_value)
+
+        return self.best_value
+
+    def run_parallel(self, n_workers, time_limit=None, seed=None, is_print=False, time_budget=None,
+                     max_no_improvement=None, callback=None):
+        """
+        多进程并行的Multi-start：各次启动相互独立，分配到进程池中执行，最后归约出最优解。
+        网络由utils.shared_dataset以内存映射的方式在各进程之间共享，fork与spawn均可，不随任务序列化；
+        各进程在紧凑形式的网络上计算，结果只与seed有关，与进程数无关。
+        进程池中同时只有约2 * n_workers个启动，满足停止条件后不再提交新的启动，尚未开始的启动被取消
+
+        :param n_workers: 进程数，为None时使用CPU核数
+        :param time_limit: 启动次数的限制
+        :param seed: 随机种子，只给定time_limit时结果可复现，且与进程数无关
+        :param is_print: 是否打印运行过程中的信息
+        :param time_budget: 墙钟时间限制（秒）
+        :param max_no_improvement: 连续没有改进的启动次数限制
+        :param callback: callback(elapsed, iteration, value, best)，每次启动之后调用，返回True时停止
+        :return: 最优的目标函数值
+        """
 
-        end_time = time.time()
-        print('Multi-start Relocation Heuristic Complete!')
-        print('Running time:', end_time - start_time)
-        print('Best value:', self.best_value)
+        if is_print:
+            print('Start Parallel Multi-start Relocation Heuristic...')
+            if callback is None:
+                callback = print_progress
+        termination = Termination(time_limit, time_budget, max_no_improvement, callback)
+
+        rng = rd.Random(seed)
+        in_flight = 2 * (n_workers or os.cpu_count() or 1)
+        futures = collections.deque()
+        submitted = 0
+
+        with utils.shared_dataset(self._dataset) as shared, \
+                utils.process_pool(n_workers, initializer=_init_worker,
+                                   initargs=(shared, self.k, self.warm_start)) as pool:
+            while True:
+                while not termination.stop() and len(futures) < in_flight \
+                        and (time_limit is None or submitted < time_limit):
+                    warm = submitted == 0 and self.warm_start is not None
+                    futures.append(pool.submit(_relocation_worker, rng.getrandbits(32), warm))
+                    submitted += 1
+                if not futures:
+                    break
+
+                # 按启动的顺序取结果，值相同时保留序号最小的解
+                value, solution = futures.popleft().result()
+                if value < self.best_value:
+                    self.best_value = value
+                    self.best_solution = solution
+
+                if termination.update(value, self.best_value):
+                    for future in futures:
+                        future.cancel()
+                    futures.clear()
+
+        if is_print:
+            print('Parallel Multi-start Relocation Heuristic Complete!')
+            print('Running time:', termination.elapsed)
+            print('Best value:', self.best_value)
 
         return self.best_value
 
@@ -151,5 +309,5 @@ if __name__ == '__main__':
     ds_name = r'\slashdot-undirected-size400-part0.g'
     ds = utils.load_data(dir_path + ds_name, 'signed')
     rh = RelocationHeuristic(dataset=ds, k=4)
-    best_val = rh.run(20)
+    best_val = rh.run(20, is_print=True)
     print('Best frustration：', best_val)
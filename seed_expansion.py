@@ -1,5 +1,8 @@
 import signed_utils as utils
+import numpy as np
+import heapq
 import warnings
+from module.partition import Partition
 
 
 class SeedExpansion:
@@ -13,21 +16,22 @@ class SeedExpansion:
         使用种子扩张的方式生成初始解
 
         :param obj_function: 目标函数类或其子类
-        :return: solution: dict, partition: dict(community: set())
+        :return: solution: np.ndarray, partition: Partition，即obj_function维护的解与划分；找不到种子时每个结点单独成社区
         """
 
         seeds = self.__generate_community_seeds()
 
         if not seeds:
             warnings.warn('No seeds are found, using standard initialization instead.')
-            return utils.standard_initialize(self._dataset.vnum)
+            partition = Partition(np.arange(self._dataset.vnum, dtype=np.int32))
+            return partition.labels, partition
         else:
             print(len(seeds), 'seeds are found.')
 
         obj = obj_function
 
-        # 创建初始解
-        init_solution = obj.solution
+        # 创建初始解，复制一份，不直接修改obj中的解
+        init_solution = obj.solution.copy()
         for seed in seeds:
             cid = init_solution[seed[0]]
             for other in seed[1:]:
@@ -36,55 +40,129 @@ class SeedExpansion:
         obj.set_solution(solution=init_solution)
         obj.update_objective_function()
         seeds_flatten = [i for j in seeds for i in j]
-        cluster_candidate = set([init_solution[i] for i in seeds_flatten])
+        cluster_candidate = set([int(init_solution[i]) for i in seeds_flatten])
 
-        # 种子扩张
-        for node in set(range(self._dataset.vnum)) - set(seeds_flatten):
+        # 种子扩张：按与已扩张社区的正边数目从多到少的顺序，由种子向外逐层扩张
+        self.__frontier_expansion(obj, seeds_flatten, cluster_candidate)
 
-            max_delta = 2 << 63
+        return obj.solution, obj.partition
+
+    def __frontier_expansion(self, obj, seeds_flatten, cluster_candidate):
+        """
+        以种子为起点向外扩张。堆中的优先级为结点与种子社区之间的正边数目，连接最紧密的结点最先被处理，
+        且只对它邻接的种子社区计算delta，移动到其中最优的一个；没有使目标函数变优的社区时保持原状，
+        之后有新的正邻居加入种子社区时会再次入堆。始终不与种子社区相连的结点保持单独成社区
+
+        :param obj: 已经放入种子的目标函数
+        :param seeds_flatten: 所有种子结点
+        :param cluster_candidate: 种子社区的编号
+        :return: None
+        """
+
+        nbr = self.neighborhood
+        solution = obj.solution
+        expanded = np.zeros(self._dataset.vnum, dtype=bool)
+        expanded[seeds_flatten] = True
+        # 结点与种子社区之间的正边数目
+        links = np.zeros(self._dataset.vnum, dtype=np.int64)
+        heap = []
+
+        def reach(node):
+            for v in nbr[node]['+']:
+                v = int(v)
+                if not expanded[v]:
+                    links[v] += 1
+                    heapq.heappush(heap, (-int(links[v]), v))
+
+        for node in seeds_flatten:
+            reach(node)
+
+        while heap:
+            priority, node = heapq.heappop(heap)
+            if expanded[node] or -priority != links[node]:
+                # 已经扩张过，或者是过期的堆项
+                continue
+
+            node_nbr = nbr[node]
+            adjacent = {int(solution[v]) for key in ('+', '-') for v in node_nbr[key]}
+            max_delta = 0
             best_move = -1
-            for c in cluster_candidate:
-                local_delta = obj.delta_caused_by_move(node, c, self.neighborhood[node])
+            for c in adjacent & cluster_candidate:
+                local_delta = obj.delta_caused_by_move(node, c, node_nbr)
                 if local_delta < max_delta:
                     max_delta = local_delta
                     best_move = c
 
             if best_move != -1:
                 obj.move(node, best_move, max_delta)
-
-        return obj.solution, obj.partition
+                expanded[node] = True
+                reach(node)
 
     def __generate_community_seeds(self):
         """
         社区种子的一种生成方法，参考文献：Detecting local community structures in complex networks
         based on local degree central nodes
 
+        在紧凑形式的网络上向量化地进行：正邻居的最大度数由np.maximum.reduceat分段求得，
+        公共正邻居由searchsorted在排好序的正边键（起点 * vnum + 终点）中查找。度数相同时取编号较小的结点
+
         :return: 检测到的社区种子，格式为list，规模为2或3
         """
 
+        graph = utils.SignedGraph.from_neighborhood(self.neighborhood)
+        vnum = graph.vnum
+
         # 结点度数 = 正度数 + 负度数
-        nbr = self.neighborhood
-        relative_degree = {i: len(nbr[i]['+']) + len(nbr[i]['-']) for i in range(self._dataset.vnum)}
+        pos_degree, neg_degree = graph.degree()
+        degree = pos_degree + neg_degree
+
+        # 只保留正边，每个结点的正邻居仍是连续的一段且按编号排好序
+        positive = graph.sign > 0
+        src = graph.sources()[positive].astype(np.int64)
+        dst = graph.indices[positive].astype(np.int64)
+        if not src.size:
+            return []
+        starts = np.zeros(vnum, dtype=np.int64)
+        np.cumsum(pos_degree[:-1], out=starts[1:])
+        has_nbr = pos_degree > 0
+
+        # 正邻居的最大度数，以及取得最大度数的第一个正邻居
+        nbr_degree = degree[dst]
+        max_nbr_degree = np.zeros(vnum, dtype=degree.dtype)
+        max_nbr_degree[has_nbr] = np.maximum.reduceat(nbr_degree, starts[has_nbr])
+        hit = np.flatnonzero(nbr_degree == max_nbr_degree[src])
+        owner, first = np.unique(src[hit], return_index=True)
+        max_nbr_id = np.full(vnum, -1, dtype=np.int64)
+        max_nbr_id[owner] = dst[hit[first]]
+
+        # 若当前点的度数高于任何一个正邻居的度数，则认为它是一个局部度中心结点
+        # 同时，找到它的最大度正邻居，绑定在一起
+        centers = np.flatnonzero(has_nbr & (degree > max_nbr_degree))
+        partners = max_nbr_id[centers]
+
+        # 中心结点的每个正邻居w，若(partner, w)也是正边，则w为二者的公共正邻居
+        counts = pos_degree[centers]
+        offsets = np.cumsum(counts) - counts
+        entries = np.arange(counts.sum()) - np.repeat(offsets - starts[centers], counts)
+        owner = np.repeat(np.arange(centers.size), counts)
+        common = dst[entries]
+        keys = src * vnum + dst
+        query = partners[owner] * vnum + common
+        found = np.minimum(np.searchsorted(keys, query), keys.size - 1)
+        is_common = (keys[found] == query) & (common != centers[owner]) & (common != partners[owner])
+        owner, common = owner[is_common], common[is_common]
+
+        # 如果有二者的公共正邻居仍不为空，找度数最大的公共正邻居加入他们
+        third = np.full(centers.size, -1, dtype=np.int64)
+        order = np.lexsort((common, -degree[common], owner))
+        owner, first = np.unique(owner[order], return_index=True)
+        third[owner] = common[order][first]
 
         candidate = []
-
-        for idx, degree in relative_degree.items():
-            # 收集邻域的度数情况
-            try:
-                nbr_degree = [(i, relative_degree[i]) for i in nbr[idx]['+']]
-                max_nbr_id, max_nbr_degree = max(nbr_degree, key=lambda x: x[1])
-            except ValueError:
-                continue
-            if degree > max_nbr_degree:
-                # 若当前点的度数高于任何一个正邻居的度数，则认为它是一个局部度中心结点
-                # 同时，找到它的最大度正邻居，绑定在一起
-                third_nbr = nbr[idx]['+'] & nbr[max_nbr_id]['+']
-                # 如果有二者的公共正邻居仍不为空，找最大的正邻居加入他们
-                if third_nbr:
-                    third_nbr_degree = [(i, relative_degree[i]) for i in third_nbr]
-                    third_chosen, __ = max(third_nbr_degree, key=lambda x: x[1])
-                    candidate.append([idx, max_nbr_id, third_chosen])
-                else:
-                    candidate.append([idx, max_nbr_id])
+        for center, partner, third_chosen in zip(centers.tolist(), partners.tolist(), third.tolist()):
+            if third_chosen >= 0:
+                candidate.append([center, partner, third_chosen])
+            else:
+                candidate.append([center, partner])
 
         return candidate
@@ -1,10 +1,18 @@
 # encoding: utf-8
 
 
+import io
+import os
+import shutil
+import tempfile
+import warnings
+import contextlib
+import itertools
 import collections
 import networkx
 import matplotlib.pyplot
 import numpy as np
+import scipy.sparse
 
 
 class Dataset:
@@ -13,12 +21,225 @@ class Dataset:
 
     vnum：结点个数，int
     enum：边的数目，int
-    datasets: 网络数据，dict(dict())
+    datasets: 网络数据，dict(dict())，或紧凑形式的SignedGraph
     """
     def __init__(self):
         self.vnum = 0
         self.enum = 0
         self.data = []
+        # data为dict(dict())时由edge_arrays生成的边数组缓存，(键, 边数组)；键为(data的id, vnum, enum)，不一致时重新生成。
+        # 边数不变的修改（例如改变边的符号）无法由键察觉，此时需置为None
+        self.edge_cache = None
+
+
+class SignedGraph:
+    """
+    # 符号网络的紧凑存储格式（CSR）
+
+    indptr: 结点i的全部邻居位于indices[indptr[i]:indptr[i+1]]，np.ndarray(int64)
+    pos_end: 结点i的正邻居为indices[indptr[i]:pos_end[i]]，负邻居为indices[pos_end[i]:indptr[i+1]]
+    indices: 邻居的结点编号，np.ndarray(int32)
+    sign: 与indices一一对应的边的符号，np.ndarray(int8)
+
+    既可以作为Dataset.data使用，也可以直接代替Neighborhood的neighborhood_structure，
+    graph[node]返回{'+': 正邻居数组, '-': 负邻居数组}
+    """
+
+    def __init__(self, vnum, enum, indptr, pos_end, indices, sign, path=None):
+        self.vnum = vnum
+        self.enum = enum
+        self.indptr = indptr
+        self.pos_end = pos_end
+        self.indices = indices
+        self.sign = sign
+        # 由load_mmap打开时记录文件路径，序列化时只传递路径，各进程共享同一份页缓存
+        self.path = path
+
+    def __reduce__(self):
+        if self.path is not None:
+            return _open_mmap_graph, (self.path,)
+        return SignedGraph, (self.vnum, self.enum, self.indptr, self.pos_end, self.indices, self.sign)
+
+    @classmethod
+    def from_edges(cls, vnum: int, n1, n2, attr, enum=None):
+        """
+        由边的数组构造紧凑的符号网络，每条边给出一次或两次均可，重复的边以最后一次为准
+
+        :param vnum: 结点个数，结点编号超过vnum时自动扩展
+        :param n1: 边的一个端点
+        :param n2: 边的另一个端点
+        :param attr: 边的符号，为0的边会被忽略
+        :param enum: 边的数目，不给出时按实际的无向边数目计算
+        :return: SignedGraph
+        """
+
+        n1 = np.asarray(n1, dtype=np.int64)
+        n2 = np.asarray(n2, dtype=np.int64)
+        attr = np.asarray(attr)
+        keep = attr != 0
+        n1, n2, attr = n1[keep], n2[keep], np.sign(attr[keep]).astype(np.int8)
+        if n1.size:
+            if min(n1.min(), n2.min()) < 0:
+                raise ValueError('结点编号不能为负数')
+            vnum = max(vnum, int(max(n1.max(), n2.max())) + 1)
+
+        # 无向边在两个端点处各存一次，交错排列以保留边在输入中的先后顺序
+        src = np.stack((n1, n2), axis=1).ravel()
+        dst = np.stack((n2, n1), axis=1).ravel()
+        sign = np.repeat(attr, 2)
+
+        # 与load_data的覆盖语义保持一致：同一条边出现多次时保留最后一次，自环也只保留一次
+        key = src * vnum + dst
+        idx = np.argsort(key, kind='stable')
+        key = key[idx]
+        last = np.ones(key.size, dtype=bool)
+        last[:-1] = key[1:] != key[:-1]
+        idx = idx[last]
+        src, dst, sign = src[idx], dst[idx], sign[idx]
+
+        # 每个结点的正邻居排在前面，负邻居排在后面
+        idx = np.argsort((src * 2 + (sign < 0)) * vnum + dst)
+        src, dst, sign = src[idx], dst[idx], sign[idx]
+
+        indptr = np.zeros(vnum + 1, dtype=np.int64)
+        np.cumsum(np.bincount(src, minlength=vnum), out=indptr[1:])
+        pos_end = indptr[:-1] + np.bincount(src[sign > 0], minlength=vnum)
+        index_type = np.int32 if vnum <= np.iinfo(np.int32).max else np.int64
+
+        if enum is None:
+            loops = int(np.count_nonzero(src == dst))
+            enum = (src.size - loops) // 2 + loops
+
+        return cls(vnum, enum, indptr, pos_end, dst.astype(index_type), sign)
+
+    @classmethod
+    def from_dataset(cls, dataset: Dataset):
+        """
+        将dict(dict())形式的数据集转化为紧凑形式
+
+        :param dataset: 由load_data读入的Dataset
+        :return: SignedGraph
+        """
+
+        n1, n2, attr = [], [], []
+        for node, row in dataset.data.items():
+            n1.extend([node] * len(row))
+            n2.extend(row.keys())
+            attr.extend(row.values())
+
+        return cls.from_edges(dataset.vnum, n1, n2, attr, enum=dataset.enum)
+
+    @classmethod
+    def from_neighborhood(cls, neighborhood):
+        """
+        由Neighborhood的邻域结构构造紧凑形式
+
+        :param neighborhood: {结点: {'+': 正邻居, '-': 负邻居}}
+        :return: SignedGraph
+        """
+
+        if isinstance(neighborhood, cls):
+            return neighborhood
+
+        n1, n2, attr = [], [], []
+        for node in range(len(neighborhood)):
+            for key, value in (('+', 1), ('-', -1)):
+                nbr = neighborhood[node][key]
+                n1.extend([node] * len(nbr))
+                n2.extend(nbr)
+                attr.extend([value] * len(nbr))
+
+        return cls.from_edges(len(neighborhood), n1, n2, attr)
+
+    def __len__(self):
+        return self.vnum
+
+    def __iter__(self):
+        return iter(range(self.vnum))
+
+    def __getitem__(self, node):
+        start, split, end = self.indptr[node], self.pos_end[node], self.indptr[node + 1]
+        return {
+            '+': self.indices[start:split],
+            '-': self.indices[split:end]
+        }
+
+    def positive(self, node):
+        return self.indices[self.indptr[node]:self.pos_end[node]]
+
+    def negative(self, node):
+        return self.indices[self.pos_end[node]:self.indptr[node + 1]]
+
+    def degree(self):
+        """
+        :return: 正度数与负度数，均为np.ndarray
+        """
+        pos_degree = self.pos_end - self.indptr[:-1]
+        neg_degree = self.indptr[1:] - self.pos_end
+        return pos_degree, neg_degree
+
+    def sources(self):
+        """
+        :return: 与indices一一对应的起点编号
+        """
+        return np.repeat(np.arange(self.vnum, dtype=self.indices.dtype), np.diff(self.indptr))
+
+    def row_entries(self, rows):
+        """
+        :param rows: 结点编号的数组
+        :return: 这些结点的所有邻接表项在indices中的下标，按rows的顺序排列
+        """
+
+        rows = np.asarray(rows)
+        counts = self.indptr[rows + 1] - self.indptr[rows]
+        offsets = np.cumsum(counts) - counts
+        return np.arange(counts.sum()) - np.repeat(offsets, counts) + np.repeat(self.indptr[rows], counts)
+
+    def edges(self):
+        """
+        每条无向边只给出一次
+
+        :return: (u, v, sign)三个数组
+        """
+        src = self.sources()
+        once = src <= self.indices
+        return src[once], self.indices[once], self.sign[once]
+
+    def adjacency(self):
+        """
+        正边与负边的邻接矩阵
+
+        :return: (A⁺, A⁻)，均为scipy.sparse.csr_matrix(int32)，元素为0或1
+        """
+
+        src = self.sources()
+        matrices = []
+        for mask in (self.sign > 0, self.sign < 0):
+            data = np.ones(np.count_nonzero(mask), dtype=np.int32)
+            matrices.append(scipy.sparse.csr_matrix((data, (src[mask], self.indices[mask])),
+                                                    shape=(self.vnum, self.vnum)))
+        return matrices[0], matrices[1]
+
+    @property
+    def nbytes(self):
+        return self.indptr.nbytes + self.pos_end.nbytes + self.indices.nbytes + self.sign.nbytes
+
+    def to_dict(self):
+        """
+        转化为load_data所使用的dict(dict())形式
+
+        :return: defaultdict(lambda: defaultdict(lambda: 0))
+        """
+
+        data = collections.defaultdict(lambda: collections.defaultdict(lambda: 0))
+        indptr = self.indptr.tolist()
+        indices, sign = self.indices.tolist(), self.sign.tolist()
+        for node in range(self.vnum):
+            start, end = indptr[node], indptr[node + 1]
+            if start < end:
+                data[node].update(zip(indices[start:end], sign[start:end]))
+
+        return data
 
 
 def load_data(path: str, network_type='signed') -> Dataset:
@@ -98,6 +319,128 @@ def load_data_with_start_one(path: str, network_type: str) -> Dataset:
     return dataset
 
 
+def load_data_fast(path: str, network_type='signed', start_one=False, compact=False, cache=True,
+                   chunk_size=1 << 26) -> Dataset:
+    """
+    读取数据的向量化版本：按块读入文件并用numpy解析，结果与load_data(或load_data_with_start_one)一致。
+    首次读取后会在数据集旁写入一个.npz缓存，之后读取同一文件只需加载数组；源文件的大小或修改时间变化时缓存自动失效。
+
+    :param path: 数据集路径
+    :param network_type: 网络的类型，目前只有signed和unsigned两种
+    :param start_one: 结点编号是否从1开始
+    :param compact: 为True时Dataset.data为SignedGraph，否则为dict(dict())
+    :param cache: 是否使用.npz缓存
+    :param chunk_size: 每次读入的字节数
+    :return: 一个Dataset，详见Dataset的描述
+    """
+
+    if network_type not in ('signed', 'unsigned'):
+        print('no such type of network')
+        raise TypeError
+
+    cache_path = path + '.npz'
+    stat = os.stat(path)
+    # 缓存的有效性由源文件的修改时间、大小以及读取方式共同决定
+    key = np.array([stat.st_mtime_ns, stat.st_size, network_type == 'signed', start_one], dtype=np.int64)
+
+    graph = None
+    if cache and os.path.exists(cache_path):
+        graph = _load_cache(cache_path, key)
+
+    if graph is None:
+        graph = _parse_edge_list(path, network_type, start_one, chunk_size)
+        if cache:
+            _save_cache(cache_path, key, graph)
+
+    dataset = Dataset()
+    dataset.vnum, dataset.enum = graph.vnum, graph.enum
+    dataset.data = graph if compact else graph.to_dict()
+
+    return dataset
+
+
+def _parse_edge_list(path, network_type, start_one, chunk_size) -> SignedGraph:
+    """
+    按块解析.g文件，每块用np.loadtxt一次性转为整数
+
+    :return: SignedGraph
+    """
+
+    columns = 3 if network_type == 'signed' else 2
+    parts = []
+
+    with open(path, 'rb') as f:
+        vnum, enum = f.readline().split()
+        rest = b''
+        while True:
+            chunk = f.read(chunk_size)
+            if not chunk:
+                break
+            chunk = rest + chunk
+            # 只解析完整的行，剩余部分留到下一块
+            cut = chunk.rfind(b'\n') + 1
+            rest = chunk[cut:]
+            parts.append(_parse_chunk(chunk[:cut], columns))
+        parts.append(_parse_chunk(rest, columns))
+
+    body = np.concatenate(parts)
+    n1, n2 = body[:, 0], body[:, 1]
+    if start_one:
+        n1, n2 = n1 - 1, n2 - 1
+
+    if network_type == 'signed':
+        attr = body[:, 2]
+        if not start_one:
+            # 与load_data一致，忽略边的属性不为1或-1的行
+            keep = (attr == 1) | (attr == -1)
+            n1, n2, attr = n1[keep], n2[keep], attr[keep]
+    else:
+        attr = np.ones(n1.size, dtype=np.int8)
+
+    return SignedGraph.from_edges(int(vnum), n1, n2, attr, enum=int(enum))
+
+
+def _parse_chunk(chunk: bytes, columns: int):
+    """
+    解析一块完整的行。某一行列数不对或含有非整数时抛出ValueError，不会静默地截断
+
+    :return: np.ndarray(int64)，形状为(行数, columns)
+    """
+
+    if not chunk.strip():
+        return np.empty((0, columns), dtype=np.int64)
+    try:
+        values = np.loadtxt(io.BytesIO(chunk), dtype=np.int64, ndmin=2)
+    except ValueError as e:
+        raise ValueError('数据集格式错误：%s' % e) from None
+    if values.shape[1] != columns:
+        raise ValueError('数据集格式错误，每行应有%d列' % columns)
+    return values
+
+
+def _load_cache(cache_path, key):
+    try:
+        with np.load(cache_path) as cached:
+            if not np.array_equal(cached['key'], key):
+                return None
+            vnum, enum = cached['shape'].tolist()
+            return SignedGraph(vnum, enum, cached['indptr'], cached['pos_end'], cached['indices'], cached['sign'])
+    except (OSError, ValueError, KeyError):
+        return None
+
+
+def _save_cache(cache_path, key, graph: SignedGraph):
+    # 先写临时文件再替换，避免并行读取时读到不完整的缓存
+    tmp_path = cache_path + '.tmp'
+    try:
+        with open(tmp_path, 'wb') as f:
+            np.savez(f, key=key, shape=np.array([graph.vnum, graph.enum], dtype=np.int64),
+                     indptr=graph.indptr, pos_end=graph.pos_end, indices=graph.indices, sign=graph.sign)
+        os.replace(tmp_path, cache_path)
+    except OSError as e:
+        warnings.warn('failed to write cache %s: %s' % (cache_path, e))
+
+
 def partition2solution(partition: dict, vnum: int, solution_type='dict') -> dict or np.array:
     """
     # 将集合形式的划分转化为向量形式的解
@@ -121,6 +464,75 @@ def partition2solution(partition: dict, vnum: int, solution_type='dict') -> dict
         return {i: solution[i] for i in range(vnum)}
 
 
+def solution2array(solution: dict or np.array or list, vnum: int) -> np.array:
+    """
+    # 将解转化为np.array形式，第i个元素为结点i的社区号
+
+    :param solution: dict(), list或np.array
+    :param vnum: 结点个数
+    :return: np.array
+    """
+
+    if isinstance(solution, np.ndarray):
+        return solution
+    if isinstance(solution, dict):
+        return np.fromiter((solution[i] for i in range(vnum)), dtype=np.int64, count=vnum)
+    return np.asarray(solution)
+
+
+def edge_arrays(dataset: Dataset) -> (np.array, np.array, np.array):
+    """
+    每条无向边只给出一次的边数组，用于向量化地计算目标函数。
+    data为dict(dict())时结果缓存在dataset.edge_cache中，data被替换或结点数、边数变化之后会重新生成；
+    data为SignedGraph时不缓存，避免每个进程都为共享的（内存映射的）网络保留一份O(m)的副本
+
+    :param dataset: 一个Dataset类，data可以是dict(dict())或SignedGraph
+    :return: (u, v, 是否为正边)三个数组
+    """
+
+    if isinstance(dataset.data, SignedGraph):
+        u, v, sign = dataset.data.edges()
+        return u, v, sign > 0
+
+    key = (id(dataset.data), dataset.vnum, dataset.enum)
+    cached = getattr(dataset, 'edge_cache', None)
+    if cached is not None and cached[0] == key:
+        return cached[1]
+
+    u, v, sign = SignedGraph.from_dataset(dataset).edges()
+    edges = (u, v, sign > 0)
+    dataset.edge_cache = (key, edges)
+
+    return edges
+
+
+def edge_blocks(dataset: Dataset, block_size=1 << 18):
+    """
+    分块给出每条无向边只出现一次的边数组。data为SignedGraph时按行分块，直接切片indptr、indices与sign，
+    每块至多约block_size个邻接表项，内存开销与网络规模无关；data为dict(dict())时只有一块，即edge_arrays
+
+    :param dataset: 一个Dataset类，data可以是dict(dict())或SignedGraph
+    :param block_size: 每块的邻接表项数目
+    :return: 生成器，每次给出(u, v, 是否为正边)
+    """
+
+    graph = dataset.data
+    if not isinstance(graph, SignedGraph):
+        yield edge_arrays(dataset)
+        return
+
+    start = 0
+    while start < graph.vnum:
+        end = int(np.searchsorted(graph.indptr, graph.indptr[start] + block_size, side='right')) - 1
+        end = min(max(end, start + 1), graph.vnum)
+        lo, hi = graph.indptr[start], graph.indptr[end]
+        src = np.repeat(np.arange(start, end, dtype=graph.indices.dtype), np.diff(graph.indptr[start:end + 1]))
+        dst = graph.indices[lo:hi]
+        once = src <= dst
+        yield src[once], dst[once], graph.sign[lo:hi][once] > 0
+        start = end
+
+
 def solution2partition(solution: dict or np.array or list) -> dict:
     """
     # 将字典形式的解转化为集合划分形式
@@ -183,6 +595,88 @@ def reform_partition(partition: dict) -> dict:
     return re_partition
 
 
+def aggregate_network(neighborhood, partition: dict) -> (Dataset, list):
+    """
+    将每个社区压缩为一个超结点，生成带权的数据集（Louvain中的聚合步骤）
+
+    超结点之间的边权为两个社区之间正边与负边的数目之和，社区内部的边成为超结点的自环，
+    因此任意划分在聚合前后的frustration相同
+
+    :param neighborhood: 邻域结构，邻居可以是集合/数组(权为1)，也可以是dict(邻居: 权)
+    :param partition: dict(community: set())
+    :return: 带权的Dataset，data[u][v] = [正边权, 负边权]；以及每个结点对应的超结点编号
+    """
+
+    super_node = [0] * len(neighborhood)
+    for idx, community in enumerate(partition.values()):
+        for node in community:
+            super_node[node] = idx
+
+    data = collections.defaultdict(dict)
+    for node in range(len(neighborhood)):
+        su = super_node[node]
+        for idx, key in enumerate(('+', '-')):
+            nbr = neighborhood[node][key]
+            for v, w in (nbr.items() if isinstance(nbr, dict) else zip(nbr, itertools.repeat(1))):
+                sv = super_node[v]
+                # 社区内部的边会从两端各访问一次，只计一次；自环只会访问一次
+                if su == sv and node > v:
+                    continue
+                entry = data[su].get(sv)
+                if entry is None:
+                    entry = data[su][sv] = [0, 0]
+                entry[idx] += w
+
+    dataset = Dataset()
+    dataset.vnum = len(partition)
+    dataset.enum = sum(len(row) + (su in row) for su, row in data.items()) // 2
+    dataset.data = data
+
+    return dataset, super_node
+
+
+def generate_planted_partition(vnum: int, k: int, avg_degree=10, inter_ratio=0.3, noise=0.05, seed=None,
+                               compact=False) -> (Dataset, np.array):
+    """
+    生成具有植入划分的符号网络：结点均匀地分到k个社区中，社区内的边为正、社区间的边为负，
+    再以noise的概率翻转边的符号
+
+    :param vnum: 结点个数
+    :param k: 社区个数
+    :param avg_degree: 平均度
+    :param inter_ratio: 社区间的边所占的比例
+    :param noise: 边的符号被翻转的概率
+    :param seed: 随机种子
+    :param compact: 为True时Dataset.data为SignedGraph，否则为dict(dict())
+    :return: 一个Dataset，以及植入的划分（np.array形式的解）
+    """
+
+    rng = np.random.default_rng(seed)
+    labels = rng.integers(k, size=vnum)
+    order = np.argsort(labels, kind='stable')
+    starts = np.searchsorted(labels[order], np.arange(k))
+    sizes = np.bincount(labels, minlength=k)
+
+    m = int(vnum * avg_degree / 2)
+    n1 = rng.integers(vnum, size=m)
+    inter = rng.random(m) < inter_ratio
+    # 社区内的边：在n1所在社区中随机选另一端；社区间的边：随机选另一端，落在同一社区的边视为社区内的边
+    offset = (rng.random(m) * sizes[labels[n1]]).astype(np.int64)
+    n2 = np.where(inter, rng.integers(vnum, size=m), order[starts[labels[n1]] + offset])
+    keep = n1 != n2
+    n1, n2 = n1[keep], n2[keep]
+
+    attr = np.where(labels[n1] == labels[n2], 1, -1)
+    attr[rng.random(n1.size) < noise] *= -1
+
+    graph = SignedGraph.from_edges(vnum, n1, n2, attr)
+    dataset = Dataset()
+    dataset.vnum, dataset.enum = graph.vnum, graph.enum
+    dataset.data = graph if compact else graph.to_dict()
+
+    return dataset, labels
+
+
 def dataset2g(dataset, file_name='generated_dataset.g'):
     """
     可以把生成的数据集写成一个.g文件，便于多次使用
@@ -195,13 +689,220 @@ def dataset2g(dataset, file_name='generated_dataset.g'):
     with open(file_name, 'w') as f:
 
         f.write(str(dataset.vnum) + '\t' + str(dataset.enum) + '\n')
-        for node in dataset.data:
-            for nbr, attr in dataset.data[node].items():
+        if isinstance(dataset.data, SignedGraph):
+            graph = dataset.data
+            edges = zip(graph.sources().tolist(), graph.indices.tolist(), graph.sign.tolist())
+            for node, nbr, attr in edges:
                 f.write(str(node) + '\t' + str(nbr) + '\t' + str(attr) + '\n')
+        else:
+            for node in dataset.data:
+                for nbr, attr in dataset.data[node].items():
+                    f.write(str(node) + '\t' + str(nbr) + '\t' + str(attr) + '\n')
+
+    print('-> 数据集存储完毕，命名为：' + file_name)
+
+
+def dataset2compact(dataset: Dataset) -> Dataset:
+    """
+    将dict(dict())形式的数据集转化为紧凑的CSR形式，节省内存
+
+    :param dataset: 一个Dataset类
+    :return: 新的Dataset，其data为SignedGraph
+    """
+
+    compact = Dataset()
+    compact.vnum, compact.enum = dataset.vnum, dataset.enum
+    compact.data = dataset.data if isinstance(dataset.data, SignedGraph) else SignedGraph.from_dataset(dataset)
+    compact.vnum = compact.data.vnum
+
+    return compact
+
+
+_BIN_MAGIC = b'SBGRAPH1'
+_BIN_HEADER = 64
+
+
+def dataset2bin(dataset: Dataset, file_name='generated_dataset.bin'):
+    """
+    把数据集以扁平数组的形式写成二进制文件，可由load_mmap以内存映射的方式打开
+
+    文件格式：64字节的文件头(标识, vnum, enum, 邻接数组长度, 结点编号的字节数)，
+    随后依次为indptr(int64)、pos_end(int64)、indices、sign(int8)，每段按8字节对齐
+
+    :param dataset: 一个Dataset类，data可以是dict(dict())或SignedGraph
+    :param file_name: 文件名
+    :return: 将对应的二进制文件写入当前目录
+    """
+
+    graph = dataset.data if isinstance(dataset.data, SignedGraph) else SignedGraph.from_dataset(dataset)
+    header = np.array([graph.vnum, dataset.enum, graph.indices.size, graph.indices.itemsize], dtype=np.int64)
+
+    with open(file_name, 'wb') as f:
+        f.write(_BIN_MAGIC)
+        f.write(header.tobytes())
+        f.write(b'\0' * (_BIN_HEADER - f.tell()))
+        for array in (graph.indptr.astype(np.int64), graph.pos_end.astype(np.int64), graph.indices, graph.sign):
+            f.write(np.ascontiguousarray(array).tobytes())
+            f.write(b'\0' * (-f.tell() % 8))
 
     print('-> 数据集存储完毕，命名为：' + file_name)
 
 
+def load_mmap(path: str) -> Dataset:
+    """
+    以内存映射(numpy.memmap)的方式打开dataset2bin写出的文件，不需要把整个网络读入内存，
+    多个进程打开同一个文件时共享操作系统的页缓存
+
+    :param path: 二进制文件路径
+    :return: 一个Dataset，其data为只读的SignedGraph
+    """
+
+    dataset = Dataset()
+    dataset.data = _open_mmap_graph(path)
+    dataset.vnum, dataset.enum = dataset.data.vnum, dataset.data.enum
+
+    return dataset
+
+
+def _open_mmap_graph(path: str) -> SignedGraph:
+
+    with open(path, 'rb') as f:
+        if f.read(len(_BIN_MAGIC)) != _BIN_MAGIC:
+            raise TypeError('%s不是dataset2bin写出的文件' % path)
+        vnum, enum, nnz, itemsize = np.frombuffer(f.read(32), dtype=np.int64).tolist()
+
+    arrays = []
+    offset = _BIN_HEADER
+    for dtype, length in ((np.int64, vnum + 1), (np.int64, vnum), (np.dtype('i%d' % itemsize), nnz), (np.int8, nnz)):
+        nbytes = np.dtype(dtype).itemsize * length
+        # numpy.memmap不能映射长度为0的数组；转为普通ndarray视图可以减少切片时的开销，数据仍在映射区内
+        arrays.append(np.memmap(path, dtype=dtype, mode='r', offset=offset, shape=(length,)).view(np.ndarray)
+                      if length else np.empty(0, dtype=dtype))
+        offset += nbytes + (-nbytes % 8)
+
+    indptr, pos_end, indices, sign = arrays
+    return SignedGraph(vnum, enum, indptr, pos_end, indices, sign, path=path)
+
+
+def graph_fingerprint(dataset: Dataset) -> dict:
+    """
+    网络的指纹：结点数、边数与所有边(u, v, 符号)的摘要，用于判断保存的解是否属于同一个网络
+
+    :param dataset: 一个Dataset类，data可以是dict(dict())或SignedGraph
+    :return: dict(vnum, enum, digest)
+    """
+
+    import hashlib
+
+    u, v, positive = edge_arrays(dataset)
+    digest = hashlib.sha1()
+    for array in (u.astype(np.int64), v.astype(np.int64), positive):
+        digest.update(np.ascontiguousarray(array).tobytes())
+
+    return {'vnum': int(dataset.vnum), 'enum': int(u.size), 'digest': digest.hexdigest()}
+
+
+def save_solution(solution, file_name, dataset: Dataset = None):
+    """
+    以压缩的二进制形式（npz）保存解，给出dataset时同时保存网络的指纹，用于之后的热启动
+
+    :param solution: dict()、list或np.array形式的解
+    :param file_name: 文件名，原样使用，不会追加扩展名
+    :param dataset: 可选，解所属的网络
+    :return: None
+    """
+
+    vnum = dataset.vnum if dataset is not None else len(solution)
+    arrays = {'labels': np.asarray(solution2array(solution, vnum), dtype=np.int32)}
+    if dataset is not None:
+        fingerprint = graph_fingerprint(dataset)
+        arrays.update(vnum=fingerprint['vnum'], enum=fingerprint['enum'], digest=np.array(fingerprint['digest']))
+
+    with open(file_name, 'wb') as f:
+        np.savez_compressed(f, **arrays)
+
+
+def load_solution(file_name, dataset: Dataset = None) -> np.array:
+    """
+    读取save_solution保存的解。给出dataset且指纹不一致时发出警告并尽量沿用：
+    网络有新增的结点时，新结点各自单独成社区；结点变少时截断
+
+    :param file_name: 文件名
+    :param dataset: 可选，要使用该解的网络
+    :return: np.array(int32)，第i个元素为结点i的社区号
+    """
+
+    with np.load(file_name) as f:
+        labels = f['labels'].astype(np.int32)
+        saved = {'vnum': int(f['vnum']), 'enum': int(f['enum']), 'digest': str(f['digest'])} if 'digest' in f else None
+
+    if dataset is None:
+        return labels
+
+    if saved is not None and saved != graph_fingerprint(dataset):
+        warnings.warn('the solution in %s was saved for a different graph (%d nodes, %d edges), adapting it'
+                      % (file_name, saved['vnum'], saved['enum']))
+
+    if labels.size > dataset.vnum:
+        labels = labels[:dataset.vnum]
+    elif labels.size < dataset.vnum:
+        first = int(labels.max()) + 1 if labels.size else 0
+        labels = np.concatenate([labels, np.arange(first, first + dataset.vnum - labels.size, dtype=np.int32)])
+
+    return labels
+
+
+# 进程池的启动方式，None表示系统支持fork时使用fork，否则使用系统默认的方式（例如Windows上的spawn）
+start_method = None
+
+
+def process_pool(n_workers=None, initializer=None, initargs=()):
+    """
+    创建进程池，启动方式由start_method决定。使用fork时initargs由子进程直接继承；
+    使用spawn时initargs会被序列化，网络应当由shared_dataset给出，序列化时只传递文件路径
+
+    :param n_workers: 进程数，默认为CPU核数
+    :param initializer: 子进程启动时调用的函数
+    :param initargs: initializer的参数
+    :return: concurrent.futures.ProcessPoolExecutor
+    """
+
+    import multiprocessing
+    from concurrent.futures import ProcessPoolExecutor
+
+    method = start_method
+    if method is None and 'fork' in multiprocessing.get_all_start_methods():
+        method = 'fork'
+    return ProcessPoolExecutor(max_workers=n_workers, mp_context=multiprocessing.get_context(method),
+                               initializer=initializer, initargs=initargs)
+
+
+@contextlib.contextmanager
+def shared_dataset(dataset: Dataset):
+    """
+    在多个进程之间共享的数据集：写成dataset2bin的临时文件并由load_mmap打开，
+    无论fork还是spawn，子进程都只是映射同一个文件，共享操作系统的页缓存，不会各复制一份网络。
+    已经由load_mmap打开的数据集直接使用
+
+    :param dataset: 一个Dataset类，data可以是dict(dict())或SignedGraph
+    :return: 上下文管理器，给出data为只读SignedGraph的Dataset，退出时删除临时文件
+    """
+
+    if isinstance(dataset.data, SignedGraph) and dataset.data.path is not None:
+        yield dataset
+        return
+
+    workdir = tempfile.mkdtemp()
+    try:
+        path = os.path.join(workdir, 'shared.bin')
+        with contextlib.redirect_stdout(io.StringIO()):
+            dataset2bin(dataset, path)
+        yield load_mmap(path)
+    finally:
+        # 仍被映射的文件在Windows上无法删除，留给系统清理临时目录
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
 def network_plot(partition: dict, dataset: Dataset):
     """
     :param partition: dict(community: set())
@@ -265,8 +966,8 @@ def detect_isolated_nodes(vnum, neighborhood):
     isolated = set()
 
     for i in range(vnum):
-        if not neighborhood[i]['+']:
-            if not neighborhood[i]['-']:
+        if len(neighborhood[i]['+']) == 0:
+            if len(neighborhood[i]['-']) == 0:
                 alone.add(i)
             else:
                 isolated.add(i)
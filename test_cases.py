@@ -29,6 +29,63 @@ class TestInitialization(TestCase):
         solution, partition = self.init.lpa_initialization()
         self.assertIsInstance(partition, dict)
 
+    def test_spectral(self):
+        solution, partition = self.init.spectral_initialization(4, seed=0)
+        self.assertEqual(len(solution), dataset.vnum)
+        self.assertLessEqual(len(partition), 4)
+
+    def test_grasp(self):
+        solution, partition = self.init.grasp_initialization(n_solutions=4, elite_size=2, seed=0)
+        values = [value for value, __ in self.init.elite_solutions]
+        self.assertEqual(values, sorted(values))
+        self.assertEqual(Frustration(dataset=dataset, init_solution=solution).objective_function(), values[0])
+        self.init.grasp_initialization(n_solutions=4, elite_size=2, seed=0, n_workers=2)
+        self.assertEqual([value for value, __ in self.init.elite_solutions], values)
+        utils.start_method = 'spawn'
+        try:
+            self.init.grasp_initialization(n_solutions=4, elite_size=2, seed=0, n_workers=2)
+        finally:
+            utils.start_method = None
+        self.assertEqual([value for value, __ in self.init.elite_solutions], values)
+
+    def test_semi_synchronous_lpa(self):
+        import random
+        random.seed(0)
+        single = self.init.lpa_initialization(mode='semi-sync')[0]
+        random.seed(0)
+        multiple = self.init.lpa_initialization(mode='semi-sync', n_workers=2)[0]
+        self.assertEqual(single.tolist(), multiple.tolist())
+
+    def test_compact_lpa(self):
+        import random
+        import label_propagation_algorithm
+        # 得分相同时随机选择标签，紧凑形式（邻居按编号排序）与dict形式的邻域结构得到的解质量相当
+        totals = {'dict': 0, 'compact': 0}
+        for seed in range(4):
+            planted, __ = utils.generate_planted_partition(2000, 8, seed=seed)
+            neighborhood = Neighborhood(dataset=planted).neighborhood_structure
+            compact = utils.SignedGraph.from_neighborhood(neighborhood)
+            for key, structure in (('dict', neighborhood), ('compact', compact)):
+                random.seed(seed)
+                solution = label_propagation_algorithm.LabelPropagation(planted, structure).label_propagation()[0]
+                totals[key] += Frustration(dataset=planted, init_solution=solution).objective_function()
+        self.assertLess(totals['compact'], 1.15 * totals['dict'])
+
+    def test_synchronous_lpa(self):
+        import random
+        planted, __ = utils.generate_planted_partition(2000, 8, seed=0)
+        init = Initialization(dataset=planted, neighborhood=Neighborhood(dataset=planted).neighborhood_structure)
+        values = {}
+        for mode in ('sync', 'semi-sync'):
+            random.seed(0)
+            single = init.lpa_initialization(mode=mode)[0]
+            random.seed(0)
+            multiple = init.lpa_initialization(mode=mode, n_workers=2)[0]
+            self.assertEqual(single.tolist(), multiple.tolist())
+            values[mode] = Frustration(dataset=planted, init_solution=single).objective_function()
+        # 同步更新会振荡，按颜色分批的半同步更新在植入划分上应当更好
+        self.assertLessEqual(values['semi-sync'], values['sync'])
+
 
 class TestFrustration(TestCase):
 
@@ -39,6 +96,65 @@ class TestFrustration(TestCase):
         f2 = self.objective_function.objective_function_v2(nbr)
         self.assertEqual(f1, f2)
 
+    def test_batch_frustration(self):
+        solutions = [Initialization(dataset=dataset, neighborhood=nbr).lpa_initialization()[0] for _ in range(3)]
+        values = self.objective_function.batch_objective_function(solutions)
+        for solution, value in zip(solutions, values):
+            self.assertEqual(Frustration(dataset=dataset, init_solution=solution).objective_function(), value)
+
+    def test_best_move(self):
+        for node in range(dataset.vnum):
+            candidate, delta = self.objective_function.best_move(node, nbr)
+            for cid in self.objective_function.get_adjacent_community(node, nbr):
+                self.assertGreaterEqual(self.objective_function.delta_caused_by_move(node, cid, nbr[node]), delta)
+            if candidate != -1:
+                self.assertEqual(self.objective_function.delta_caused_by_move(node, candidate, nbr[node]), delta)
+
+    def test_best_move_in_k_clusters(self):
+        k = 5
+        obj = Frustration(dataset=dataset, init_solution=[node % k for node in range(dataset.vnum)])
+        for node in range(dataset.vnum):
+            candidate, delta = obj.best_move(node, nbr, n_clusters=k)
+            deltas = [obj.delta_caused_by_move(node, cid, nbr[node]) for cid in range(k) if cid != obj.solution[node]]
+            self.assertEqual(min(deltas), delta)
+            self.assertEqual(obj.delta_caused_by_move(node, candidate, nbr[node]), delta)
+
+    def test_community_links(self):
+        obj = Frustration(dataset=dataset)
+        LocalSearch(obj_function=obj, neighborhood=nbr).local_move()
+        obj.build_community_links(nbr)
+        for c1 in list(obj.partition.keys())[:20]:
+            for c2 in obj.get_adjacent_community_of_community(c1, nbr):
+                links, obj.community_links = obj.community_links, None
+                expected = obj.delta_caused_by_merge(c1, c2, nbr)
+                obj.community_links = links
+                self.assertEqual(obj.delta_caused_by_merge(c1, c2, nbr), expected)
+
+        def links_table(o):
+            return {c1: {c2: tuple(entry) for c2, entry in row.items()} for c1, row in o.community_links.items() if row}
+
+        # move、merge与rollback之后，增量维护的统计表与重新统计的结果一致
+        communities = list(obj.partition.keys())
+        obj.merge(communities[0], communities[1], 0)
+        for node in range(0, dataset.vnum, 7):
+            obj.move(node, communities[node % len(communities)], 0)
+        incremental = links_table(obj)
+        obj.build_community_links(nbr)
+        self.assertEqual(incremental, links_table(obj))
+
+        obj.checkpoint()
+        for node in range(0, dataset.vnum, 5):
+            obj.move(node, communities[-1], 0)
+        obj.rollback()
+        incremental = links_table(obj)
+        obj.build_community_links(nbr)
+        self.assertEqual(incremental, links_table(obj))
+
+        # community_merge建立的统计表在合并结束后关闭
+        obj.drop_community_links()
+        LocalSearch(obj_function=obj, neighborhood=nbr).community_merge()
+        self.assertIsNone(obj.community_links)
+
 
 class TestLocalSearch(TestCase):
 
@@ -61,6 +177,305 @@ class TestLocalSearch(TestCase):
         value_after_update = self.objective_function.obj_value
         self.assertEqual(value_after_update, value_after_merge)
 
+    def test_multilevel_move(self):
+        objective_function = Frustration(dataset=dataset)
+        objective_function.update_objective_function()
+        LocalSearch(obj_function=objective_function, neighborhood=nbr).multilevel_move()
+        value_after_move = objective_function.obj_value
+        self.assertEqual(objective_function.update_objective_function(), value_after_move)
+
+    def test_weighted_merge(self):
+        partition = Initialization(dataset=dataset, neighborhood=nbr).lpa_initialization()[1]
+        aggregated, __ = utils.aggregate_network(nbr, partition)
+        neighborhood = WeightedNeighborhood(aggregated).neighborhood_structure
+        obj = WeightedFrustration(aggregated)
+        obj.update_objective_function()
+        obj.build_community_links(neighborhood)
+        for c1 in list(obj.partition.keys())[:20]:
+            for c2 in obj.get_adjacent_community_of_community(c1, neighborhood):
+                links, obj.community_links = obj.community_links, None
+                expected = obj.delta_caused_by_merge(c1, c2, neighborhood)
+                obj.community_links = links
+                self.assertEqual(obj.delta_caused_by_merge(c1, c2, neighborhood), expected)
+
+        LocalSearch(obj_function=obj, neighborhood=neighborhood).community_merge()
+        self.assertEqual(obj.objective_function(), obj.obj_value)
+
+    def test_decompose(self):
+        objective_function = Frustration(dataset=dataset, init_solution=[0] * dataset.vnum)
+        value = objective_function.update_objective_function()
+        ls = LocalSearch(obj_function=objective_function, neighborhood=nbr)
+        if ls.community_decompose():
+            self.assertLess(objective_function.obj_value, value)
+        self.assertEqual(objective_function.update_objective_function(), objective_function.obj_value)
+
+    def test_active_set(self):
+        objective_function = Frustration(dataset=dataset)
+        objective_function.update_objective_function()
+        ls = LocalSearch(obj_function=objective_function, neighborhood=nbr)
+        ls.local_move(active_set=True)
+        self.assertEqual(objective_function.update_objective_function(), objective_function.obj_value)
+        # 收敛之后，无论逐趟遍历还是从任意结点开始，都不会再有结点移动
+        self.assertFalse(ls.local_move(active_set=False))
+        self.assertFalse(ls.local_move(nodes=[0, 1, 2]))
+
+        worklist = ActiveSet(4, [2, 0, 2])
+        self.assertEqual(len(worklist), 2)
+        self.assertEqual(worklist.pop(), 2)
+
+
+class TestPartition(TestCase):
+
+    def test_move_and_merge(self):
+        partition = Partition.from_solution(Initialization(dataset=dataset, neighborhood=nbr).lpa_initialization()[0])
+        communities = list(partition.keys())
+        partition.move(0, communities[-1])
+        partition.merge(communities[0], communities[1])
+        for cid, community in partition.items():
+            for node in community:
+                self.assertEqual(partition.labels[node], cid)
+
+    def test_relabel(self):
+        partition = Partition.from_solution([4, 4, 9, 2]).relabel()
+        self.assertEqual(partition.labels.tolist(), [1, 1, 2, 0])
+        self.assertEqual(partition, {0: {3}, 1: {0, 1}, 2: {2}})
+
+    def test_rollback(self):
+        partition = Partition.from_solution([0, 0, 1, 2, 2])
+        partition.checkpoint()
+        partition.move(2, 0)
+        partition.merge(0, 2)
+        self.assertEqual(partition.best().tolist(), [0, 0, 1, 2, 2])
+        partition.rollback()
+        self.assertEqual(partition.labels.tolist(), [0, 0, 1, 2, 2])
+        self.assertEqual(partition, {0: {0, 1}, 1: {2}, 2: {3, 4}})
+        partition.move(0, 1)
+        partition.checkpoint()
+        self.assertEqual(partition.best().tolist(), [1, 0, 1, 2, 2])
+
+    def test_frustration_rollback(self):
+        obj = Frustration(dataset=dataset)
+        obj.update_objective_function()
+        obj.checkpoint()
+        LocalSearch(obj, nbr).local_move()
+        obj.rollback()
+        self.assertEqual(obj.obj_value, obj.objective_function())
+        self.assertEqual(len(obj.partition), dataset.vnum)
+
+
+class TestSignedGraph(TestCase):
+
+    compact = utils.dataset2compact(dataset)
+    graph = compact.data
+
+    def test_neighborhood(self):
+        for i in range(dataset.vnum):
+            self.assertEqual(set(self.graph[i]['+'].tolist()), nbr[i]['+'])
+            self.assertEqual(set(self.graph[i]['-'].tolist()), nbr[i]['-'])
+
+    def test_frustration(self):
+        f1 = Frustration(dataset=dataset).objective_function()
+        f2 = Frustration(dataset=self.compact).objective_function()
+        self.assertEqual(f1, f2)
+
+    def test_local_move(self):
+        objective_function = Frustration(dataset=self.compact)
+        objective_function.update_objective_function()
+        LocalSearch(obj_function=objective_function, neighborhood=Neighborhood(self.compact).neighborhood_structure).local_move()
+        value_after_move = objective_function.obj_value
+        self.assertEqual(objective_function.update_objective_function(), value_after_move)
+
+
+class TestLoader(TestCase):
+
+    def test_load_data_fast(self):
+        fast = utils.load_data_fast(file_dir + file_name, cache=False)
+        self.assertEqual(fast.enum, dataset.enum)
+        for node, row in dataset.data.items():
+            self.assertEqual(dict(fast.data[node]), dict(row))
+
+    def test_cache(self):
+        import os
+        import shutil
+        import tempfile
+        with tempfile.TemporaryDirectory() as workdir:
+            path = os.path.join(workdir, 'dataset.g')
+            shutil.copy(file_dir + file_name, path)
+            first = utils.load_data_fast(path, compact=True)
+            self.assertTrue(os.path.exists(path + '.npz'))
+            second = utils.load_data_fast(path, compact=True)
+            self.assertTrue((first.data.indptr == second.data.indptr).all())
+            self.assertTrue((first.data.indices == second.data.indices).all())
+
+            # 源文件改变之后缓存失效，读到的是新的内容
+            v = next(v for v in range(1, dataset.vnum) if v not in nbr[0]['+'] and v not in nbr[0]['-'])
+            with open(path, 'a') as f:
+                f.write('0\t%d\t-1\n' % v)
+            changed = utils.load_data_fast(path, compact=True)
+            self.assertIn(v, changed.data[0]['-'].tolist())
+            self.assertEqual(changed.data.indices.size, first.data.indices.size + 2)
+
+    def test_mmap(self):
+        import os
+        import tempfile
+        with tempfile.TemporaryDirectory() as workdir:
+            path = os.path.join(workdir, 'test_dataset.bin')
+            utils.dataset2bin(dataset, path)
+            mapped = utils.load_mmap(path)
+            self.assertEqual(Frustration(dataset=mapped).objective_function(),
+                             Frustration(dataset=dataset).objective_function())
+            for i in range(dataset.vnum):
+                self.assertEqual(set(mapped.data[i]['+'].tolist()), nbr[i]['+'])
+            # 映射的文件在Windows上无法删除，退出临时目录之前先释放
+            del mapped
+
+    def test_save_solution(self):
+        import os
+        import tempfile
+        solution = Initialization(dataset=dataset, neighborhood=nbr).lpa_initialization()[0]
+        with tempfile.TemporaryDirectory() as workdir:
+            path = os.path.join(workdir, 'test_solution.bin')
+            utils.save_solution(solution, path, dataset)
+            self.assertEqual(utils.load_solution(path, dataset).tolist(), solution.tolist())
+
+            obj = Frustration(dataset=dataset, init_solution=solution)
+            warm = Initialization(dataset=dataset, neighborhood=nbr).warm_start_initialization(path)[0]
+            self.assertEqual(Frustration(dataset=dataset, init_solution=warm).objective_function(),
+                             obj.objective_function())
+
+
+class TestRelocationHeuristic(TestCase):
+
+    def test_initialization(self):
+        import relocation_heuristic
+        heuristic = relocation_heuristic.RelocationHeuristic(dataset=dataset, k=6)
+        exemplar = heuristic.random_select()
+        signature = heuristic.signed_adjacency()[2]
+        self.assertEqual(len({signature[v] for v in exemplar}), 6)
+
+        solution = heuristic.initialization(exemplar)
+        for vertex in set(range(dataset.vnum)) - exemplar:
+            similarity = [heuristic.neighborhood_similarity(vertex, u) for u in exemplar]
+            idx, __ = max(enumerate(similarity), key=lambda x: x[1])
+            self.assertEqual(solution[vertex], idx)
+
+    def test_run_parallel(self):
+        import relocation_heuristic
+        single = relocation_heuristic.RelocationHeuristic(dataset=dataset, k=4).run_parallel(1, 4, seed=0, is_print=False)
+        multiple = relocation_heuristic.RelocationHeuristic(dataset=dataset, k=4).run_parallel(2, 4, seed=0, is_print=False)
+        self.assertEqual(single, multiple)
+
+    def test_run_parallel_spawn(self):
+        import relocation_heuristic
+        forked = relocation_heuristic.RelocationHeuristic(dataset=dataset, k=4).run_parallel(2, 4, seed=0, is_print=False)
+        utils.start_method = 'spawn'
+        try:
+            spawned = relocation_heuristic.RelocationHeuristic(dataset=dataset, k=4).run_parallel(2, 4, seed=0,
+                                                                                                 is_print=False)
+        finally:
+            utils.start_method = None
+        self.assertEqual(forked, spawned)
+
+
+class TestVariableNeighborhoodSearch(TestCase):
+
+    def test_warm_start(self):
+        import random
+        import variable_neighborhood_search
+        import os
+        import tempfile
+        solution = Initialization(dataset=dataset, neighborhood=nbr).lpa_initialization()[0]
+        with tempfile.TemporaryDirectory() as workdir:
+            path = os.path.join(workdir, 'test_solution.bin')
+            # 社区编号不连续的解
+            utils.save_solution(solution * 7 + 3, path, dataset)
+            random.seed(0)
+            vns = variable_neighborhood_search.VariableNeighborhoodSearch(dataset=dataset, warm_start=path)
+        vns.run(5, is_print=False)
+        self.assertLess(max(vns.best_solution), vns.k)
+        self.assertEqual(Frustration(dataset=dataset, init_solution=vns.best_solution).objective_function(),
+                         vns.best_value)
+
+    def test_callback(self):
+        import random
+        import relocation_heuristic
+        import variable_neighborhood_search
+        planted, __ = utils.generate_planted_partition(1000, 8, noise=0.2, seed=0)
+        random.seed(0)
+        init_solution = relocation_heuristic.RelocationHeuristic(dataset=planted, k=8).relocation_heuristic()[0]
+        vns = variable_neighborhood_search.VariableNeighborhoodSearch(dataset=planted, init_solution=init_solution)
+        initial = vns.best_value
+        progress = []
+        vns.run(10, y_pert=0.1, y_min=0.1,
+                callback=lambda elapsed, iteration, value, best: progress.append((value, best)))
+        # 回调得到的是每次迭代实际得到的值，而不是rollback之后的当前最优值
+        self.assertTrue(all(value >= best for value, best in progress))
+        self.assertTrue(any(value > best for value, best in progress))
+        self.assertEqual(vns.best_value, min([initial] + [value for value, __ in progress]))
+
+
+class TestDynamicNetwork(TestCase):
+
+    def test_update(self):
+        import random
+        ds = utils.load_data(file_dir + file_name)
+        neighborhood = Neighborhood(dataset=ds).neighborhood_structure
+        obj = Frustration(dataset=ds)
+        obj.update_objective_function()
+        network = DynamicNetwork(obj, neighborhood)
+
+        random.seed(0)
+        for __ in range(200):
+            u, v = random.sample(range(ds.vnum + 2), 2)
+            network.update([(u, v, random.choice([1, -1, 0]))])
+            self.assertEqual(obj.obj_value, obj.objective_function())
+        network.repair()
+        self.assertEqual(obj.obj_value, obj.objective_function())
+        self.assertEqual(len(obj.solution), ds.vnum)
+
+
+class TestProfiling(TestCase):
+
+    def test_enable(self):
+        profiling.enable()
+        try:
+            profiling.stats.reset()
+            obj = Frustration(dataset=dataset)
+            obj.update_objective_function()
+            LocalSearch(obj, nbr).local_move()
+            counters = profiling.stats.as_dict()['counters']
+            self.assertEqual(counters['Frustration.move'], counters['local_move.moves'])
+            self.assertEqual(counters['Frustration.best_move'], counters['local_move.nodes_scanned'])
+        finally:
+            profiling.disable()
+        self.assertFalse(hasattr(Frustration.move, '__wrapped__'))
+
+
+class TestIteratedGreedy(TestCase):
+
+    def test_run(self):
+        import iterated_greedy_algorithm
+        ig = iterated_greedy_algorithm.IteratedGreedy(dataset=dataset)
+        ig.run(max_iter=5)
+        obj = ig.objective_function
+        self.assertEqual(obj.obj_value, obj.objective_function())
+        self.assertEqual(ig.best_value, obj.obj_value)
+        self.assertEqual(ig.best_solution.tolist(), obj.solution.tolist())
+
+    def test_callback(self):
+        import iterated_greedy_algorithm
+        progress = []
+
+        def callback(elapsed, iteration, value, best):
+            progress.append((iteration, value, best))
+            return iteration >= 3
+
+        ig = iterated_greedy_algorithm.IteratedGreedy(dataset=dataset)
+        best_value = ig.run(max_iter=None, callback=callback)
+        self.assertEqual(len(progress), 3)
+        self.assertEqual(progress[-1][2], best_value)
+        self.assertEqual(Frustration(dataset=dataset, init_solution=ig.best_solution).objective_function(), best_value)
+
 
 if __name__ == '__main__':
     unittest.main()
@@ -1,4 +1,3 @@
-import time
 import random as rd
 import signed_utils as utils
 import relocation_heuristic as relocation_heuristic
@@ -7,17 +6,37 @@ from module import *
 
 class VariableNeighborhoodSearch:
 
-    def __init__(self, dataset: utils.Dataset, init_solution):
+    def __init__(self, dataset: utils.Dataset, init_solution=None, warm_start=None):
+        """
+        :param dataset: 数据集
+        :param init_solution: 初始解，例如Relocation Heuristic得到的解
+        :param warm_start: 可选，由utils.save_solution保存的解的文件名，给出时代替init_solution
+        """
 
         self._dataset = dataset
         self._neighborhood = Neighborhood(dataset).neighborhood_structure
+        if warm_start is not None:
+            init_solution = Initialization(dataset, self._neighborhood).warm_start_initialization(warm_start)[0]
+        elif init_solution is None:
+            raise ValueError('either init_solution or warm_start must be given')
         self.obj_function = Frustration(dataset=dataset, init_solution=init_solution)
+        # 扰动与best_move(n_clusters=k)假定社区编号为0..k-1
+        self.obj_function.partition.relabel()
         self.obj_function.update_objective_function()
+        self.obj_function.checkpoint()
         self.k = len(self.obj_function.partition)
-        self.best_solution = self.obj_function.solution
+        self.best_solution = self.obj_function.solution.copy()
         self.best_value = self.obj_function.obj_value
+        self.__local_optimum = False
+
+    def perturbation(self, y_pert=0.005, worklist=None):
+        """
+        以概率y_pert将结点随机移动至另一个cluster
 
-    def perturbation(self, y_pert=0.005):
+        :param y_pert: 扰动的概率
+        :param worklist: 可选的ActiveSet，被扰动的结点及其邻居会加入其中
+        :return: 扰动后的解
+        """
 
         obj = self.obj_function
 
@@ -30,79 +49,120 @@ class VariableNeighborhoodSearch:
                 # randomly move into a new cluster with probability y_pert
                 if rd.random() < y_pert:
 
-                    cid = rd.choice(list(range(h)) + list(range(h+1, self.k)))
+                    cid = rd.randrange(self.k - 1)
+                    cid += cid >= h
                     delta = obj.delta_caused_by_move(node=v, destination=cid, node_neighborhood=self._neighborhood[v])
+                    if worklist is not None:
+                        if obj.partition.size(cid) == 1:
+                            worklist.push(next(iter(obj.partition[cid])))
+                        worklist.push(v)
+                        worklist.push_neighbors(v, self._neighborhood[v])
                     obj.move(v, cid, delta)
 
         return obj.solution
 
-    def relocation_heuristic(self):
+    def relocation_heuristic(self, worklist=None):
         """
         算法主要流程
 
+        :param worklist: 可选的ActiveSet，只从其中的结点开始考察，默认为所有结点
         :return: 一个locally optimal solution
         """
 
         obj = self.obj_function
         # ## start relocation heuristic ## #
-        improvement = False
-
-        while not improvement:
-            improvement = True
+        # 工作队列：只有邻居发生了移动（或所在社区不再只有自己）的结点才需要重新考察
+        if worklist is None:
+            worklist = ActiveSet(self._dataset.vnum, range(self._dataset.vnum))
 
-            for v in range(self._dataset.vnum):
-                h = obj.solution[v]
+        while worklist:
+            v = worklist.pop()
+            h = obj.solution[v]
 
-                # try to find the best movement
-                if len(obj.partition[h]) > 1:
+            # try to find the best movement
+            if len(obj.partition[h]) > 1:
 
-                    for cid in set(range(self.k)) - {h}:
-                        delta = obj.delta_caused_by_move(node=v, destination=cid, node_neighborhood=self._neighborhood[v])
+                # 只考虑邻接社区与一个不相邻的社区，一次遍历邻居即可得到所有候选的delta
+                cid, delta = obj.best_move(v, self._neighborhood, n_clusters=self.k)
 
-                        if delta < 0:
-                            obj.move(v, cid, delta=delta)
-                            improvement = False
+                if cid != -1 and delta < 0:
+                    if obj.partition.size(cid) == 1:
+                        # 原本只有一个结点的社区，其中的结点从此可以移动
+                        worklist.push(next(iter(obj.partition[cid])))
+                    obj.move(v, cid, delta=delta)
+                    worklist.push_neighbors(v, self._neighborhood[v])
 
         # ## end relocation heuristic ## #
 
         return obj.solution, obj.obj_value
 
     def variable_neighborhood_search(self, y_pert, y_min, y_max, y_step):
+        """
+        一次迭代：扰动、局部搜索，之后接受改进或回到当前最优解
 
-        obj = self.obj_function
-        self.perturbation(y_pert=y_pert)
-        self.relocation_heuristic()
+        :return: (下一次迭代的扰动概率, 这一次迭代得到的局部最优值)
+        """
 
-        if obj.obj_value < self.best_value:
+        obj = self.obj_function
+        if self.__local_optimum:
+            # 当前解已是局部最优，只需考察被扰动的结点及其邻居
+            worklist = ActiveSet(self._dataset.vnum)
+            with profiling.phase('vns.perturbation'):
+                self.perturbation(y_pert=y_pert, worklist=worklist)
+            with profiling.phase('vns.relocation'):
+                self.relocation_heuristic(worklist)
+        else:
+            with profiling.phase('vns.perturbation'):
+                self.perturbation(y_pert=y_pert)
+            with profiling.phase('vns.relocation'):
+                self.relocation_heuristic()
+            self.__local_optimum = True
+
+        value = obj.obj_value
+        if value < self.best_value:
+            obj.checkpoint()
+            self.best_solution = obj.solution.copy()
             self.best_value = obj.obj_value
-            self.best_solution = obj.solution
             y_pert = y_min
         else:
+            # 没有改进时回到当前最优解，下一次迭代从最优解出发以更大的概率扰动；
+            # 撤销日志因此只包含一次迭代中的改动，rollback的开销也只与这些改动成正比
+            obj.rollback()
             y_pert += y_step
             if y_pert > y_max:
                 y_pert = y_min
 
-        return y_pert
-
-    def run(self, time_limit, y_pert=0.005, y_min=0.005, y_max=0.2, y_step=0.005, is_print=True):
+        return y_pert, value
 
-        print('Start Variable Neighborhood Search...')
-        t = 0
-        start_time = time.time()
+    def run(self, time_limit=None, y_pert=0.005, y_min=0.005, y_max=0.2, y_step=0.005, is_print=False,
+            time_budget=None, max_no_improvement=None, callback=None):
+        """
+        算法的运行函数，满足任意一个停止条件即停止，停止时best_solution与best_value总是当前的最优解
+
+        :param time_limit: 最大迭代次数
+        :param is_print: 是否输出运行过程中的信息
+        :param time_budget: 墙钟时间限制（秒）
+        :param max_no_improvement: 连续没有改进的迭代次数限制
+        :param callback: callback(elapsed, iteration, value, best)，每次迭代之后调用，返回True时停止
+        :return: 最优的目标函数值
+        """
 
-        while t < time_limit:
+        if is_print:
+            print('Start Variable Neighborhood Search...')
+            if callback is None:
+                callback = print_progress
+        termination = Termination(time_limit, time_budget, max_no_improvement, callback)
 
-            y_pert = self.variable_neighborhood_search(y_pert=y_pert, y_min=y_min, y_max=y_max, y_step=y_step)
+        while not termination.stop():
 
-            t += 1
-            if is_print:
-                print('Current iteration: %d/%d' % (t, time_limit))
-                print('Current best value: %d' % self.best_value)
+            y_pert, value = self.variable_neighborhood_search(y_pert=y_pert, y_min=y_min, y_max=y_max, y_step=y_step)
+            # rollback之前的值，即这一次迭代实际得到的解
+            termination.update(value, self.best_value)
 
-        end_time = time.time()
-        print('Variable Neighborhood Search Complete!')
-        print('Running time:', end_time - start_time)
-        print('Best value:', self.best_value)
+        if is_print:
+            print('Variable Neighborhood Search Complete!')
+            print('Running time:', termination.elapsed)
+            print('Best value:', self.best_value)
 
         return self.best_value
 
@@ -113,9 +173,9 @@ if __name__ == '__main__':
     ds = utils.load_data(dir_path + ds_name, 'signed')
 
     rh = relocation_heuristic.RelocationHeuristic(dataset=ds, k=8)
-    rh.run(time_limit=20)
+    rh.run(time_limit=20, is_print=True)
     print(rh.best_solution)
     print(rh.best_value)
     vns = VariableNeighborhoodSearch(dataset=ds, init_solution=rh.best_solution)
-    vns.run(time_limit=200)
+    vns.run(time_limit=200, is_print=True)
     # utils.network_plot(vns.obj_function.partition, ds)